@@ -0,0 +1,184 @@
+import argparse
+import json
+import math
+import sys
+
+import user_csv as us
+import datasets
+import design_project as dp
+import profiling
+
+
+OPTIONS = (1, 2, 3, 4) # The menu options batch queries can run
+
+
+def read_queries(filename):
+    """
+    Reads queries one at a time from a JSON lines file or a CSV file with a header row.
+    The columns / keys are region, country, option, year and extreme (min or max).
+
+
+    Parameters:
+    - filename (string): name of the query file, files ending in .csv are read as CSV and anything else as JSON lines
+
+
+    Yields:
+    - query (dict): the next query, without any empty fields
+    """
+    if filename.lower().endswith(".csv"):
+        headers = None
+        for batch in us.iter_csv(filename):
+            for row in batch:
+                if headers is None: # The first row is the header
+                    headers = [str(header).strip() for header in row]
+                    continue
+                yield {headers[i]: row[i] for i in range(min(len(headers), len(row))) if row[i] != ""}
+    else:
+        with open(filename, "r", encoding="utf-8-sig") as f:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except json.JSONDecodeError: # Handed on as it is so run_batch reports it instead of stopping
+                        yield InvalidLine(line.strip())
+
+
+class InvalidLine(str):
+    """
+    A line of a query file that is not valid JSON.
+    """
+
+
+def run_query(query):
+    """
+    Runs a single query without asking the user anything.
+
+
+    Parameters:
+    - query (dict): the query, see read_queries
+
+
+    Returns:
+    - result (dict): the answer of the analysis the option stands for
+
+    Raises ValueError if the query is not valid.
+    """
+    if isinstance(query, InvalidLine):
+        raise ValueError("not valid JSON")
+    if not isinstance(query, dict):
+        raise ValueError("a query must be a JSON object")
+    for key in ("region", "country", "extreme"):
+        if key in query and not isinstance(query[key], str):
+            raise ValueError(f"{key} must be a string")
+
+    try:
+        option = int(query["option"])
+    except (KeyError, TypeError, ValueError, OverflowError): # OverflowError for an infinite number like 1e999
+        raise ValueError("option must be a number from 1 to 4")
+    if option not in OPTIONS:
+        raise ValueError("option must be a number from 1 to 4")
+
+    # Checks the region and country the same way the menu does
+    country = datasets.load(datasets.COUNTRY_FILE)
+    region_name = query.get("region")
+    country_name = query.get("country")
+    if region_name not in country.groups("UN Sub-Region"):
+        raise ValueError(f"unknown sub-region {region_name!r}")
+    if country_name is not None:
+        if country_name not in country.index:
+            raise ValueError(f"unknown country {country_name!r}")
+        if country.columns["UN Sub-Region"][country.index[country_name]] != region_name:
+            raise ValueError(f"{country_name} is not in {region_name}")
+    elif option in (2, 3): # These options are about a single country
+        raise ValueError(f"option {option} needs a country")
+
+    if option == 1:
+        return dp.species_averages(region_name)
+    elif option == 2:
+        return dp.population_change(country_name)
+    elif option == 3:
+        try:
+            year = int(float(query["year"]))
+        except (KeyError, TypeError, ValueError, OverflowError):
+            raise ValueError("option 3 needs a year")
+        if f"{year} Pop" not in datasets.load(datasets.POPULATION_FILE).columns:
+            raise ValueError(f"there is no population data for {year}")
+        return dp.population_density(year, country_name)
+    else:
+        return dp.species_extreme(str(query.get("extreme", "")).lower(), region_name)
+
+
+def run_batch(queries, output):
+    """
+    Runs every query and writes one JSON line per query with either its result or the reason it failed.
+    Every query shares the same loaded datasets.
+
+
+    Parameters:
+    - queries (iterable): the queries to run, see read_queries
+    - output (file): where the results are written
+
+
+    Returns:
+    - (tuple): the number of queries that succeeded and the number that failed
+    """
+    succeeded = 0
+    failed = 0
+    for query in queries:
+        try:
+            line = {"query": query, "result": run_query(query)}
+            succeeded += 1
+        except ValueError as e:
+            line = {"query": query, "error": str(e)}
+            failed += 1
+        except KeyError as e: # The country is missing from one of the other data files
+            line = {"query": query, "error": f"no data for {e}"}
+            failed += 1
+        except Exception as e: # Anything else is reported too, so one bad query never stops the rest
+            line = {"query": query, "error": f"{type(e).__name__}: {e}"}
+            failed += 1
+        output.write(json.dumps(clean(line)) + "\n")
+    return succeeded, failed
+
+
+def clean(value):
+    """
+    Replaces NaN, for example the density of a country without a land area, and infinity with None so the output is valid JSON.
+
+
+    Parameters:
+    - value: a result or part of one
+    """
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    elif isinstance(value, dict):
+        return {key: clean(item) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [clean(item) for item in value]
+    return value
+
+
+def main(argv=None):
+    """
+    Command line entry point, run python batch.py --help for the arguments.
+    """
+    parser = argparse.ArgumentParser(description="Runs menu options 1 to 4 for every query in a file without prompting.")
+    parser.add_argument("queries", help="JSON lines or .csv file with region, country, option, year and extreme")
+    parser.add_argument("output", nargs="?", help="JSON lines file to write the results to (default: standard output)")
+    parser.add_argument("--profile", action="store_true", help="print how long each stage took when the batch is done")
+    args = parser.parse_args(argv)
+    if args.profile:
+        profiling.enable()
+
+    if args.output is None:
+        succeeded, failed = run_batch(read_queries(args.queries), sys.stdout)
+    else:
+        with open(args.output, "w") as output:
+            succeeded, failed = run_batch(read_queries(args.queries), output)
+
+    print(f"{succeeded} queries answered, {failed} failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+import argparse
+import builtins
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import user_csv as us
+import datasets
+import regions
+import density
+import timeseries
+import query
+import memo
+import plots
+import design_project as dp
+
+
+NUM_REGIONS = 20 # Number of sub-regions in the synthetic country data
+SPECIES_HEADERS = ["Mammals", "Birds", "Fish", "Plants"]
+CHUNK_ROWS = 100000 # Rows generated and written at a time so generating big files does not need much memory
+
+
+def generate_data(directory, rows, years=21, seed=0):
+    """
+    Writes synthetic Country_Data.csv, Population_Data.csv and Threatened_Species.csv files with the same columns as the real ones.
+
+
+    Parameters:
+    - directory (string): folder to write the files to
+    - rows (int): number of countries
+    - years (int): number of population years, ending in 2020 (at least 21, which is what the real data has)
+    - seed (int): seed of the random numbers so runs are repeatable
+    """
+    if years < 21:
+        raise ValueError("the analyses expect at least 21 years of population data")
+    os.makedirs(directory, exist_ok=True)
+    random = np.random.default_rng(seed)
+    year_list = list(range(2020, 2020 - years, -1)) # Newest year first like the real file
+
+    files = {
+        datasets.COUNTRY_FILE: ("", "Country,UN Region,UN Sub-Region,Sq Km"),
+        datasets.POPULATION_FILE: ("\ufeff", "Country," + ",".join(f"{year} Pop" for year in year_list)), # The real file starts with a BOM
+        datasets.SPECIES_FILE: ("\ufeff", "Country," + ",".join(SPECIES_HEADERS)),
+    }
+    handles = {name: open(os.path.join(directory, name), "w", encoding="utf-8", newline="") for name in files}
+    try:
+        for name, (bom, header) in files.items():
+            handles[name].write(bom + header + "\n")
+
+        for start in range(0, rows, CHUNK_ROWS):
+            count = min(CHUNK_ROWS, rows - start)
+            names = np.char.add("Country ", np.char.zfill(np.arange(start, start + count).astype(str), 8))
+            region_codes = random.integers(0, NUM_REGIONS, count)
+            sub_regions = np.char.add("Sub-Region ", np.char.zfill(region_codes.astype(str), 2))
+            continents = np.char.add("Region ", (region_codes // 4).astype(str))
+            areas = random.integers(100, 10000000, count)
+
+            # Population grows by a random rate each year going back from 2020
+            latest = random.integers(10000, 1500000000, count).astype(np.float64)
+            rates = random.uniform(-0.01, 0.03, count)
+            populations = np.round(latest[:, np.newaxis] / (1 + rates[:, np.newaxis]) ** np.arange(years)).astype(np.int64)
+            species = random.integers(0, 2000, (count, len(SPECIES_HEADERS)))
+
+            _write_chunk(handles[datasets.COUNTRY_FILE], [names, continents, sub_regions, areas.astype(str)])
+            _write_chunk(handles[datasets.POPULATION_FILE], [names] + [populations[:, i].astype(str) for i in range(years)])
+            _write_chunk(handles[datasets.SPECIES_FILE], [names] + [species[:, i].astype(str) for i in range(len(SPECIES_HEADERS))])
+    finally:
+        for handle in handles.values():
+            handle.close()
+
+
+def _write_chunk(handle, columns):
+    """
+    Writes columns of strings as CSV rows.
+    """
+    lines = columns[0]
+    for column in columns[1:]:
+        lines = np.char.add(np.char.add(lines, ","), column)
+    handle.write("\n".join(lines.tolist()) + "\n")
+
+
+def measure(function, *args, setup=None):
+    """
+    Runs a function twice: once to time it, and once with tracemalloc on to find the most memory it allocated.
+    Tracing every allocation makes code several times slower, so the timed run is not traced.
+
+
+    Parameters:
+    - function (function): what to measure
+    - args: the arguments to call it with
+    - setup (function): called before each of the two runs without being measured, for example to empty the caches
+      so the second run does the same work as the first
+
+
+    Returns:
+    - (dict): "seconds" and "peak_bytes"
+    """
+    if setup is not None:
+        setup()
+    start = time.perf_counter()
+    function(*args)
+    seconds = time.perf_counter() - start
+
+    if setup is not None:
+        setup()
+    tracing = tracemalloc.is_tracing() # Already on when profiling is enabled, and then it has to stay on
+    if not tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    before = tracemalloc.get_traced_memory()[0]
+    try:
+        function(*args)
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        if not tracing:
+            tracemalloc.stop()
+    return {"seconds": seconds, "peak_bytes": peak}
+
+
+def _reset_caches():
+    """
+    Forgets every loaded dataset and computed result so the next analysis starts from scratch.
+    """
+    datasets.clear()
+    regions._summary.clear()
+    density._matrix.clear()
+    timeseries._series.clear()
+    memo.clear()
+
+
+def _no_input(prompt=""):
+    raise RuntimeError(f"the benchmark tried to ask for input: {prompt!r}")
+
+
+def run_benchmarks(rows, years, max_read_csv_rows):
+    """
+    Generates data of one size and measures the CSV functions and the computations behind the analyses on it.
+
+
+    Parameters:
+    - rows (int): number of countries to generate
+    - years (int): number of population years to generate
+    - max_read_csv_rows (int): read_csv builds a Python list of every cell, so it is skipped above this many rows
+
+
+    Returns:
+    - results (list): one dict per measurement
+    """
+    results = []
+
+    def record(name, function, *args, setup=None):
+        result = measure(function, *args, setup=setup)
+        results.append(dict(name=name, rows=rows, years=years, **result))
+        print(f"{rows:>10} rows {years:>3} years  {name:<32} {result['seconds']:10.4f} s  {result['peak_bytes'] / 1e6:10.1f} MB")
+
+    with tempfile.TemporaryDirectory() as directory:
+        generate_data(directory, rows, years)
+        population_file = os.path.join(directory, datasets.POPULATION_FILE)
+
+        # The CSV functions on their own
+        if rows <= max_read_csv_rows:
+            record("read_csv", us.read_csv, population_file, False)
+        record("read_columns", us.read_columns, population_file)
+        record("read_columns (all cores)", us.read_columns, population_file, False, None)
+        density_rows = [["Country", 2020, 123.45]] * rows
+        record("write_csv", us.write_csv, os.path.join(directory, "Density_Data.csv"), density_rows, True)
+
+        # Loading all three files, first by parsing them and then from their sidecars
+        names = (datasets.COUNTRY_FILE, datasets.POPULATION_FILE, datasets.SPECIES_FILE)
+        def load_all():
+            for name in names:
+                datasets.load(name)
+
+        def no_sidecars():
+            _reset_caches()
+            for name in names:
+                shutil.rmtree(us.sidecar_path(os.path.join(directory, name)), ignore_errors=True)
+
+        old_directory = datasets.DATA_DIR
+        datasets.DATA_DIR = directory
+        try:
+            selective = query.Query(datasets.POPULATION_FILE).select("Country", "2020 Pop").region("Sub-Region 00")
+            record("query one region (scan)", selective.collect, setup=no_sidecars)
+            record("load (parse)", load_all, setup=no_sidecars)
+            record("load (sidecar)", load_all, setup=_reset_caches)
+            new_rows = [[f"Appended {i}"] + [1000.0] * years for i in range(max(1, rows // 100))] # 1% more countries
+            record("append 1% + load (tail)", datasets.append, datasets.POPULATION_FILE, new_rows) # Appends twice, 2% in all
+
+            # The computations behind the four menu options, on already loaded data
+            country = datasets.load(datasets.COUNTRY_FILE)
+            region_name = country.columns["UN Sub-Region"][0]
+            country_name = country.columns["Country"][0]
+            # Each first call is measured without the results of earlier calls, the repeated ones with them
+            record("option 1 species_averages", dp.species_averages, region_name,
+                   setup=lambda: (memo.clear(), regions._summary.clear()))
+            record("option 1 (repeated)", dp.species_averages, region_name)
+            record("option 2 population_change", dp.population_change, country_name,
+                   setup=lambda: (memo.clear(), timeseries._series.clear()))
+            record("option 3 population_density", dp.population_density, 2010, country_name,
+                   setup=lambda: (memo.clear(), density._matrix.clear()))
+            record("option 3 (matrix cached)", dp.population_density, 2015, country_name, setup=memo.clear)
+            record("option 4 species_extreme", dp.species_extreme, "max", region_name, setup=memo.clear)
+            record("timeseries top_movers", timeseries.top_movers)
+            record("query one region (loaded)", selective.collect)
+        finally:
+            datasets.DATA_DIR = old_directory
+            _reset_caches()
+    return results
+
+
+def main(argv=None):
+    """
+    Command line entry point, run python benchmark.py --help for the arguments.
+    """
+    parser = argparse.ArgumentParser(description="Times the CSV loaders and analyses on synthetic data of increasing size.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[195, 10000], help="numbers of countries to generate, for example 195 10000 1000000 10000000")
+    parser.add_argument("--years", type=int, nargs="+", default=[21], help="numbers of population years to generate, at least 21")
+    parser.add_argument("--max-read-csv-rows", type=int, default=1000000, help="skip read_csv above this many rows")
+    parser.add_argument("--output", default="benchmark_results.json", help="JSON file to save the results to")
+    args = parser.parse_args(argv)
+
+    # Nothing in the benchmark should ask the user anything or draw a graph
+    original_input = builtins.input
+    original_render = plots.cached_render
+    builtins.input = _no_input
+    plots.cached_render = lambda job: job["output"]
+    try:
+        results = []
+        for years in args.years:
+            for rows in args.sizes:
+                results += run_benchmarks(rows, years, args.max_read_csv_rows)
+    finally:
+        builtins.input = original_input
+        plots.cached_render = original_render
+
+    report = {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved {len(results)} measurements to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+import numpy as np
+
+
+class Dictionary:
+    """
+    A growing set of distinct strings, each with a fixed integer code. Every data file shares the same dictionaries,
+    so a country or region has the same code in all of them.
+
+    Attributes:
+    - values (NumPy array): the strings, indexed by code
+    """
+
+    def __init__(self):
+        self.values = np.array([], dtype=str)
+        self._sorted = np.array([], dtype=str) # The strings in sorted order, so they can be found with a binary search
+        self._sorted_codes = np.array([], dtype=np.int32) # The code of each sorted string
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self._sorted.nbytes + self._sorted_codes.nbytes
+
+    def code(self, value):
+        """
+        Returns the code of a string, or -1 if it is not in the dictionary.
+        """
+        position = np.searchsorted(self._sorted, value)
+        if position < len(self._sorted) and self._sorted[position] == value:
+            return int(self._sorted_codes[position])
+        return -1
+
+    def encode(self, strings):
+        """
+        Turns strings into their codes, adding the ones that are not in the dictionary yet.
+
+
+        Parameters:
+        - strings (NumPy array): the strings to encode
+
+
+        Returns:
+        - codes (NumPy array): an int32 code for every string
+        """
+        uniques, inverse = np.unique(np.asarray(strings, dtype=str), return_inverse=True) # Each distinct string is only looked up once
+
+        positions = np.searchsorted(self._sorted, uniques)
+        found = positions < len(self._sorted)
+        found[found] = self._sorted[positions[found]] == uniques[found]
+        lookup = np.empty(len(uniques), dtype=np.int32)
+        lookup[found] = self._sorted_codes[positions[found]]
+
+        new = uniques[~found]
+        if len(new): # Gives the new strings the next codes and merges them into the sorted strings
+            new_codes = np.arange(len(self.values), len(self.values) + len(new), dtype=np.int32)
+            lookup[~found] = new_codes
+            self.values = np.concatenate([self.values, new])
+            merged = np.concatenate([self._sorted, new])
+            order = np.argsort(merged, kind="stable")
+            self._sorted = merged[order]
+            self._sorted_codes = np.concatenate([self._sorted_codes, new_codes])[order]
+        return lookup[inverse.ravel()]
+
+
+COUNTRIES = Dictionary()
+REGIONS = Dictionary()
+
+# The text columns that are stored as codes, and the dictionary each one uses
+CATEGORICAL = {"Country": COUNTRIES, "UN Region": REGIONS, "UN Sub-Region": REGIONS}
+
+
+def nbytes():
+    """
+    Returns the memory used by the shared dictionaries.
+    """
+    return COUNTRIES.nbytes + REGIONS.nbytes
+
+
+def rebuild(columns):
+    """
+    Starts the shared dictionaries again with only the strings the given columns use, and renumbers those columns
+    to match. The dictionaries only ever grow otherwise, so this is how the strings of dropped datasets are freed.
+    Columns that are not given keep the old dictionary, so they still turn into the right strings.
+
+
+    Parameters:
+    - columns (list): the columns that should use the new dictionaries, anything that is not a Categorical is skipped
+    """
+    global COUNTRIES, REGIONS, CATEGORICAL
+    replacements = {id(COUNTRIES): Dictionary(), id(REGIONS): Dictionary()}
+    for column in columns:
+        if not isinstance(column, Categorical) or id(column.dictionary) not in replacements:
+            continue
+        dictionary = replacements[id(column.dictionary)]
+        present = np.unique(column.codes) # Each distinct code is only encoded once
+        renumber = np.zeros(len(column.dictionary), dtype=np.int32)
+        renumber[present] = dictionary.encode(column.dictionary.values[present])
+        codes = renumber[column.codes]
+        codes.flags.writeable = column.codes.flags.writeable
+        column.codes, column.dictionary = codes, dictionary
+
+    COUNTRIES, REGIONS = replacements[id(COUNTRIES)], replacements[id(REGIONS)]
+    CATEGORICAL = {"Country": COUNTRIES, "UN Region": REGIONS, "UN Sub-Region": REGIONS}
+
+
+class Categorical:
+    """
+    A text column stored as one int32 code per row instead of the full string, see Dictionary.
+    It can be used like the unicode array it replaces: indexing it gives strings back and comparing it with a string
+    compares codes, so "column == region_name" never compares any text.
+
+    Attributes:
+    - codes (NumPy array): the code of each row
+    - dictionary (Dictionary): what the codes stand for
+    """
+
+    def __init__(self, codes, dictionary):
+        self.codes = codes
+        self.dictionary = dictionary
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, key):
+        values = self.dictionary.values[self.codes[key]]
+        return str(values) if values.ndim == 0 else values # A single row gives a plain string
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.dictionary.values[self.codes]
+        return values if dtype is None else values.astype(dtype)
+
+    def __eq__(self, other):
+        if isinstance(other, Categorical) and other.dictionary is self.dictionary:
+            return self.codes == other.codes
+        if isinstance(other, str):
+            return self.codes == self.dictionary.code(other) # -1 never matches if the string is unknown
+        return np.asarray(self) == other
+
+    def __ne__(self, other):
+        return ~(self == other)
+
+    __hash__ = None
+
+    @property
+    def dtype(self):
+        return self.dictionary.values.dtype
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+    @property
+    def flags(self):
+        return self.codes.flags
+
+    def take(self, rows):
+        """
+        Returns the given rows as a new Categorical, without turning them back into strings.
+        """
+        return Categorical(self.codes[rows], self.dictionary)
+
+    def tolist(self):
+        strings = self.dictionary.values.tolist()
+        return [strings[code] for code in self.codes.tolist()]
+
+
+def encode(header, column):
+    """
+    Stores a column as codes if it is one of the CATEGORICAL text columns, anything else is returned as it is.
+
+
+    Parameters:
+    - header (string): the header of the column
+    - column (NumPy array): the parsed column
+
+
+    Returns:
+    - column (Categorical or NumPy array)
+    """
+    if header not in CATEGORICAL or isinstance(column, Categorical) or column.dtype.kind != "U":
+        return column
+    return Categorical(CATEGORICAL[header].encode(column), CATEGORICAL[header])
+
+
+def concatenate(first, second):
+    """
+    Joins two parts of a column, see encode. Both parts must be categorical or neither.
+    """
+    if isinstance(first, Categorical):
+        return Categorical(np.concatenate([first.codes, second.codes]), first.dictionary)
+    return np.concatenate([first, second])
+
+
+def factorize(column):
+    """
+    Finds the distinct values of a column and numbers them in sorted order, like np.unique with return_inverse.
+    A categorical column only has its codes sorted, not its strings.
+
+
+    Parameters:
+    - column (Categorical or NumPy array): the column
+
+
+    Returns:
+    - (tuple): the distinct values sorted, and the number of each row's value in that list
+    """
+    if not isinstance(column, Categorical):
+        values, inverse = np.unique(column, return_inverse=True)
+        return values, inverse.ravel()
+
+    present, inverse = np.unique(column.codes, return_inverse=True)
+    values = column.dictionary.values[present]
+    order = np.argsort(values, kind="stable")
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
+    return values[order], rank[inverse.ravel()]
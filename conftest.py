@@ -0,0 +1,24 @@
+import os
+
+import pytest
+
+import datasets
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    """
+    Points datasets at an empty data directory, with an empty cache before and after the test.
+    """
+    monkeypatch.setattr(datasets, "DATA_DIR", str(tmp_path))
+    datasets.clear()
+    yield tmp_path
+    datasets.clear()
+
+
+@pytest.fixture
+def repo_data(monkeypatch):
+    """
+    Points datasets at the data files of the repository, wherever the tests are run from.
+    """
+    monkeypatch.setattr(datasets, "DATA_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_files"))
@@ -0,0 +1,332 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+import user_csv as us
+import categories
+import profiling
+
+
+# Where the data files live and their names
+DATA_DIR = "data_files"
+COUNTRY_FILE = "Country_Data.csv"
+POPULATION_FILE = "Population_Data.csv"
+SPECIES_FILE = "Threatened_Species.csv"
+
+MAX_CACHE_BYTES = 256 * 1024 * 1024 # Datasets are evicted once the loaded columns take up more than this many bytes
+
+_cache = OrderedDict() # Maps a file path to its Dataset, ordered from least to most recently used
+
+
+class Dataset:
+    """
+    A data file that has been parsed into read-only columns.
+
+    Attributes:
+    - filename (string): path of the csv file
+    - headers (list): the column headers in file order
+    - columns (dict): maps each header to a read-only NumPy array of that column. The country and region columns are
+      categories.Categorical columns, which store a shared int32 code per row instead of the string.
+    - mtime (int): modification time of the file in nanoseconds when it was loaded
+    - size (int): size of the file in bytes when it was loaded
+    - offset (int): how many bytes of the file have been parsed into the columns
+    - digest (string): hash of the parsed bytes, so an appended file can be checked to still start the same way
+    - version (int): goes up by one every time rows are appended, so results computed from the dataset can tell they are stale
+    - nbytes (int): memory used by the columns
+    - index (dict): maps each value of the first column (the country) to its row
+    """
+
+    def __init__(self, filename, columns, mtime, size, offset=None, digest=None):
+        self.filename = filename
+        self.headers = list(columns)
+        self.columns = columns
+        self.mtime = mtime
+        self.size = size
+        self.offset = size if offset is None else offset
+        self.digest = digest
+        self.version = 0
+        for header in self.headers: # Repeated names are stored once in the shared dictionaries
+            columns[header] = categories.encode(header, columns[header])
+        self.nbytes = sum(column.nbytes for column in columns.values())
+
+        for column in columns.values(): # Every caller shares these arrays so nobody is allowed to change them
+            column.flags.writeable = False
+
+        # Builds the country -> row lookup once so finding a country does not need to scan the column
+        self.index = {}
+        if self.headers:
+            keys = columns[self.headers[0]].tolist()
+            self.index = dict(zip(reversed(keys), range(len(keys) - 1, -1, -1))) # Built back to front so the first row wins if a name appears twice
+        self._groups = {} # Group indexes are only built when they are first asked for
+
+    def __len__(self):
+        """
+        Returns the number of rows in the dataset, not counting the header.
+        """
+        if not self.headers:
+            return 0
+        return len(self.columns[self.headers[0]])
+
+    def rows_for(self, keys):
+        """
+        Finds the rows of several countries at once.
+
+        Parameters:
+        - keys (list): values of the first column, for example country names
+
+        Returns:
+        - rows (NumPy array): the row of each key in the same order, ready to be used as a fancy index
+
+        Raises KeyError if one of the keys is not in the dataset.
+        """
+        return np.array([self.index[key] for key in keys], dtype=np.intp)
+
+    def rows_of(self, keys):
+        """
+        Finds the rows of many countries at once, for example to line another file up with this one.
+
+        Parameters:
+        - keys (Categorical or NumPy array): values of the first column
+
+        Returns:
+        - rows (NumPy array): the row of each key, -1 where the key is not in the dataset
+        """
+        column = self.columns[self.headers[0]]
+        if isinstance(keys, categories.Categorical) and isinstance(column, categories.Categorical) \
+                and keys.dictionary is column.dictionary: # Both use the same codes, so a lookup table does the join
+            table = np.full(len(column.dictionary), -1, dtype=np.intp)
+            table[column.codes[::-1]] = np.arange(len(column) - 1, -1, -1) # Written back to front so the first row wins
+            return table[keys.codes]
+        return np.array([self.index.get(key, -1) for key in keys.tolist()], dtype=np.intp)
+
+    def groups(self, header):
+        """
+        Groups the rows of the dataset by the values of one column, for example "UN Sub-Region".
+
+        Parameters:
+        - header (string): the column to group by
+
+        Returns:
+        - groups (dict): maps each value of the column to a NumPy array of the rows that have it, in file order
+        """
+        if header not in self._groups:
+            self._groups[header] = _group_rows(self.columns[header])
+        return self._groups[header]
+
+    def group(self, header, value):
+        """
+        Returns the rows that have the given value in a column, or an empty array if there are none.
+
+        Parameters:
+        - header (string): the column to look in
+        - value: the value to look for
+        """
+        return self.groups(header).get(value, np.array([], dtype=np.intp))
+
+    def is_current(self, stat):
+        """
+        Checks whether the dataset still matches the file on disk.
+
+        Parameters:
+        - stat (os.stat_result): the current stats of the file
+
+        Returns:
+        - (boolean): True if the file has not changed since it was loaded
+        """
+        return self.mtime == stat.st_mtime_ns and self.size == stat.st_size
+
+    def extend(self, columns, offset, stat, digest):
+        """
+        Adds rows parsed from the end of the file to the dataset in place. The columns are replaced by longer copies,
+        while the country index and any group indexes that have been built are updated rather than rebuilt.
+
+        Parameters:
+        - columns (dict): the new rows, from user_csv.read_tail
+        - offset (int): how far the file has now been parsed
+        - stat (os.stat_result): the stats of the file the rows were read from
+        - digest (string): hash of the file up to offset, see user_csv.hash_prefix
+
+        Returns:
+        - (boolean): False if the new rows do not fit the types of the existing columns, for example text in a numeric
+          column. Nothing is changed in that case and the file has to be loaded from scratch.
+        """
+        if not us.tail_fits(self.columns, columns):
+            return False
+        if self.headers and len(columns[self.headers[0]]):
+            columns = {header: categories.encode(header, column) for header, column in columns.items()}
+            start = len(self)
+            for header in self.headers: # The dict itself is kept so everyone holding it sees the new rows
+                column = categories.concatenate(self.columns[header], columns[header])
+                column.flags.writeable = False
+                self.columns[header] = column
+
+            for row, key in enumerate(columns[self.headers[0]].tolist(), start):
+                self.index.setdefault(key, row) # The first row still wins if a name appears twice
+            for header, groups in self._groups.items():
+                for value, rows in _group_rows(columns[header], start).items():
+                    if value in groups:
+                        rows = np.concatenate([groups[value], rows])
+                        rows.flags.writeable = False
+                    groups[value] = rows
+
+        self.nbytes = sum(column.nbytes for column in self.columns.values())
+        self.mtime = stat.st_mtime_ns
+        self.size = stat.st_size
+        self.offset = offset
+        self.digest = digest
+        self.version += 1
+        return True
+
+
+def _group_rows(column, start=0):
+    """
+    Groups the rows of a column by their value.
+
+    Parameters:
+    - column (NumPy array or Categorical): the values
+    - start (int): the row number of the first value
+
+    Returns:
+    - groups (dict): maps each value to a read-only NumPy array of its rows, in file order
+    """
+    values, codes = categories.factorize(column) # Only sorts the integer codes of a categorical column
+    order = np.argsort(codes, kind="stable") # Stable so the rows in each group stay in file order
+    if start:
+        order += start
+    order.flags.writeable = False
+    bounds = np.cumsum(np.bincount(codes, minlength=len(values)))[:-1]
+    return dict(zip(values.tolist(), np.split(order, bounds)))
+
+
+@profiling.profiled("load")
+def load(name):
+    """
+    Returns the parsed contents of a data file, only reading it from disk the first time or after it has changed.
+    Large files are parsed on every core.
+
+    Parameters:
+    - name (string): name of the file in DATA_DIR, for example COUNTRY_FILE
+
+    Returns:
+    - dataset (Dataset): the shared, read-only dataset
+    """
+    path = os.path.join(DATA_DIR, name)
+    stat = os.stat(path) # Taken before reading so a change made during the read is picked up next time
+
+    dataset = _cache.get(path)
+    if dataset is not None and dataset.is_current(stat):
+        _cache.move_to_end(path) # Marks it as the most recently used
+        return dataset
+
+    # Only the new rows are parsed if the file has just grown, which is checked by hashing everything parsed so far
+    hasher = None
+    if dataset is not None and dataset.headers:
+        with profiling.stage("load.verify"):
+            hasher = us.verify_prefix(path, dataset.offset, dataset.digest, stat.st_size)
+    if hasher is not None:
+        previous = dataset.digest
+        with profiling.stage("load.tail"):
+            columns, offset = us.read_tail(path, dataset.offset, dataset.headers, end=stat.st_size, hasher=hasher)
+            extended = dataset.extend(columns, offset, stat, hasher.hexdigest())
+        if extended:
+            with profiling.stage("csv.write_sidecar"): # So the next run does not have to parse the file either
+                if not us.append_sidecar(path, columns, stat, previous, dataset.offset, dataset.digest):
+                    us.write_sidecar(path, dataset.columns, stat, dataset.offset, dataset.digest)
+            _cache.move_to_end(path)
+            _evict()
+            return dataset
+
+    columns, offset, digest = us.load_columns(path, processes=None, stat=stat)
+    dataset = Dataset(path, columns, stat.st_mtime_ns, stat.st_size, offset, digest)
+    _cache[path] = dataset
+    _cache.move_to_end(path)
+    _evict()
+    return dataset
+
+
+def cached(name):
+    """
+    Returns the dataset of a file if it is already loaded and the file has not changed since, without reading the file.
+
+    Parameters:
+    - name (string): name of the file in DATA_DIR
+
+    Returns:
+    - dataset (Dataset): the loaded dataset, or None
+    """
+    path = os.path.join(DATA_DIR, name)
+    dataset = _cache.get(path)
+    if dataset is None:
+        return None
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return dataset if dataset.is_current(stat) else None
+
+
+def derived(cache, compute, *sources):
+    """
+    Returns a result computed from some datasets, computing it again only when one of them has been loaded again
+    or has had rows appended since the last time. Only the last result is kept.
+
+
+    Parameters:
+    - cache (dict): where the last result and the datasets it came from are kept, one dict per kind of result
+    - compute (function): computes the result, called with the datasets
+    - sources (Dataset): the datasets the result is computed from
+
+    Returns:
+    - the result
+    """
+    versions = tuple(dataset.version for dataset in sources)
+    previous = cache.get("sources", ())
+    if len(previous) == len(sources) and all(a is b for a, b in zip(previous, sources)) and cache["versions"] == versions:
+        return cache["result"]
+    result = compute(*sources)
+    cache.update(sources=sources, versions=versions, result=result)
+    return result
+
+
+def append(name, rows):
+    """
+    Appends rows to the end of a data file and adds them to the loaded dataset without parsing the rest of the file again.
+
+    Parameters:
+    - name (string): name of the file in DATA_DIR, or a path to any csv file with a header row
+    - rows (2D list): the rows to add, in the same column order as the file
+
+    Returns:
+    - dataset (Dataset): the dataset with the new rows
+    """
+    path = os.path.join(DATA_DIR, name)
+    load(name) # Makes sure everything up to now has been parsed, so only the new rows are left to read afterwards
+    us.write_csv(path, rows, False)
+    return load(name)
+
+
+def _evict():
+    """
+    Drops the least recently used datasets until the cache fits in MAX_CACHE_BYTES.
+    The shared category dictionaries count too, and are rebuilt without the strings of the dropped datasets.
+    The most recently loaded dataset is always kept.
+    """
+    while len(_cache) > 1 and sum(dataset.nbytes for dataset in _cache.values()) + categories.nbytes() > MAX_CACHE_BYTES:
+        _cache.popitem(last=False)
+        _rebuild_categories()
+
+
+def _rebuild_categories():
+    """
+    Rebuilds the category dictionaries from the datasets that are still cached, see categories.rebuild.
+    """
+    categories.rebuild([column for dataset in _cache.values() for column in dataset.columns.values()])
+
+
+def clear():
+    """
+    Empties the cache so every file is read again on its next load, and empties the category dictionaries.
+    """
+    _cache.clear()
+    _rebuild_categories()
@@ -0,0 +1,164 @@
+import argparse
+import os
+
+import numpy as np
+
+import user_csv as us
+import datasets
+import profiling
+import timeseries
+
+
+_matrix = {} # The last density matrix, see datasets.derived
+
+
+def density_matrix():
+    """
+    Computes the population density of every country in every year at once.
+    The matrix is kept until the population or country data changes, see datasets.derived.
+
+
+    Returns:
+    - matrix (dict) with the keys:
+        - "countries" (NumPy array): country names in the order of the population data file
+        - "years" (NumPy array): the years, oldest first
+        - "values" (NumPy array): density in people per square kilometer, one row per country and one column per year.
+          NaN where the country has no land area.
+        - "country_rows" (dict): maps each country to its row
+        - "year_columns" (dict): maps each year to its column
+    """
+    population = datasets.load(datasets.POPULATION_FILE)
+    country = datasets.load(datasets.COUNTRY_FILE)
+    return datasets.derived(_matrix, _compute_matrix, population, country)
+
+
+@profiling.profiled("density.matrix")
+def _compute_matrix(population, country):
+    """
+    Does the work for density_matrix.
+
+
+    Parameters:
+    - population (Dataset): the population dataset
+    - country (Dataset): the country dataset
+    """
+    years, year_headers = timeseries.year_headers(population) # Found from the headers, so columns can be added or moved
+
+    countries = population.columns["Country"]
+    populations = np.column_stack([population.columns[header] for header in year_headers])
+
+    # Lines the land area up with the population rows, countries missing from the country data get NaN
+    area_rows = country.rows_of(countries)
+    areas = np.where(area_rows >= 0, country.columns["Sq Km"][area_rows], np.nan)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = populations / areas[:, np.newaxis] # Divides every year of every country in one go
+
+    values.flags.writeable = False
+    return {
+        "countries": countries,
+        "years": years,
+        "values": values,
+        "country_rows": population.index,
+        "year_columns": dict(zip(years.tolist(), range(len(years)))),
+    }
+
+
+def lookup(country_name, year):
+    """
+    Returns the population density of one country in one year.
+
+
+    Parameters:
+    - country_name (string): name of the country
+    - year (int): the year
+
+
+    Returns:
+    - density (float): people per square kilometer, NaN if the country has no land area
+
+    Raises KeyError if there is no data for the country or the year.
+    """
+    matrix = density_matrix()
+    return float(matrix["values"][matrix["country_rows"][country_name], matrix["year_columns"][int(year)]])
+
+
+def density_slice(region_name=None, start_year=None, end_year=None):
+    """
+    Picks the densities of a sub-region and / or a range of years out of the density matrix.
+
+
+    Parameters:
+    - region_name (string): only countries in this sub region, all countries if None
+    - start_year (int): first year to include, the oldest year if None
+    - end_year (int): last year to include, the newest year if None
+
+
+    Returns:
+    - (tuple): the country names, the years and the densities with one row per country and one column per year
+    """
+    matrix = density_matrix()
+    rows = np.arange(len(matrix["countries"]))
+    if region_name is not None:
+        country = datasets.load(datasets.COUNTRY_FILE)
+        names = country.columns["Country"][country.group("UN Sub-Region", region_name)].tolist()
+        rows = np.array([matrix["country_rows"][name] for name in names if name in matrix["country_rows"]], dtype=np.intp)
+
+    years = matrix["years"]
+    keep = np.ones(len(years), dtype=bool)
+    if start_year is not None:
+        keep &= years >= start_year
+    if end_year is not None:
+        keep &= years <= end_year
+
+    return matrix["countries"][rows], years[keep], matrix["values"][np.ix_(rows, keep)]
+
+
+def export_density(filename, region_name=None, start_year=None, end_year=None, overwrite=True):
+    """
+    Writes the densities of a slice of the matrix to a CSV file in one go, one "country,year,density" row per value
+    like the single density export of the menu. A new file starts with a header row, so an export log that is
+    appended to can be loaded with datasets.load and only its new rows are parsed each time.
+
+
+    Parameters:
+    - filename (string): name of the csv file with .csv at the end
+    - region_name, start_year, end_year: the slice to export, see density_slice
+    - overwrite (boolean): whether to overwrite or append to an existing file
+
+
+    Returns:
+    - (int): the number of rows written
+    """
+    countries, years, values = density_slice(region_name, start_year, end_year)
+
+    # Flattens the slice into long format without looping over the values in Python
+    country_column = np.repeat(countries, len(years))
+    year_column = np.tile(years, len(countries)).astype(str)
+    density_column = np.char.mod("%.2f", np.round(values, 2).ravel())
+    rows = np.column_stack([country_column, year_column, density_column]).tolist()
+
+    if overwrite or not os.path.exists(filename) or os.path.getsize(filename) == 0:
+        us.write_csv(filename, [["Country", "Year", "Density"]] + rows, True)
+    else:
+        us.write_csv(filename, rows, False)
+    return len(rows)
+
+
+def main(argv=None):
+    """
+    Command line entry point that exports population densities to a CSV file.
+    """
+    parser = argparse.ArgumentParser(description="Exports population densities to a CSV file.")
+    parser.add_argument("output", help="csv file to write")
+    parser.add_argument("--region", help="only countries in this sub-region")
+    parser.add_argument("--start", type=int, help="first year to export")
+    parser.add_argument("--end", type=int, help="last year to export")
+    args = parser.parse_args(argv)
+
+    count = export_density(args.output, args.region, args.start, args.end)
+    print(f"Saved {count} densities to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
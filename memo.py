@@ -0,0 +1,92 @@
+import copy
+import functools
+import inspect
+from collections import OrderedDict
+
+import datasets
+
+
+MAX_ENTRIES = 4096 # The least recently used results are forgotten once there are more than this many
+
+_entries = OrderedDict() # Maps (function, arguments, fingerprint) to the result, least recently used first
+_counts = {} # Maps a function name to [hits, misses]
+
+
+def fingerprint(names):
+    """
+    Describes the current state of some data files, so a result computed from them can tell when it is stale.
+    The files are loaded if they are not yet, which is what the analyses do first anyway.
+
+
+    Parameters:
+    - names (tuple): names of the files in DATA_DIR
+
+
+    Returns:
+    - (tuple): the path, modification time, size and version of every file's dataset
+    """
+    state = []
+    for name in names:
+        dataset = datasets.load(name)
+        state.append((dataset.filename, dataset.mtime, dataset.size, dataset.version))
+    return tuple(state)
+
+
+def memoize(*names):
+    """
+    Decorator that remembers the results of an analysis, for as long as the data files it reads stay the same.
+    Every call gets its own copy of the result, so changing it does not change the remembered one.
+    Errors are not remembered.
+
+
+    Parameters:
+    - names: the data files the analysis reads, for example datasets.COUNTRY_FILE
+    """
+    def decorator(function):
+        signature = inspect.signature(function)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            # Binding the arguments first means f("France") and f(country_name="France") share one entry
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = (function.__name__, bound.args, tuple(sorted(bound.kwargs.items())), fingerprint(names))
+            counts = _counts.setdefault(function.__name__, [0, 0])
+            try:
+                result = _entries[key]
+            except KeyError:
+                counts[1] += 1
+            except TypeError: # An argument that cannot be hashed, like a list
+                counts[1] += 1
+                return function(*bound.args, **bound.kwargs)
+            else:
+                counts[0] += 1
+                _entries.move_to_end(key) # Marks it as the most recently used
+                return copy.deepcopy(result)
+
+            result = function(*bound.args, **bound.kwargs)
+            _entries[key] = copy.deepcopy(result)
+            while len(_entries) > MAX_ENTRIES:
+                _entries.popitem(last=False)
+            return result
+        return wrapper
+    return decorator
+
+
+def stats():
+    """
+    Returns how often each analysis was answered from memory.
+
+
+    Returns:
+    - (dict): maps each function name to a dict with "hits" and "misses"
+    """
+    return {name: {"hits": hits, "misses": misses} for name, (hits, misses) in _counts.items()}
+
+
+def clear():
+    """
+    Forgets every remembered result and resets the counters.
+    """
+    _entries.clear()
+    _counts.clear()
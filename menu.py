@@ -0,0 +1,131 @@
+import sys
+
+import datasets
+import design_project as dp
+import profiling
+
+
+def print_options():
+    """
+    Displays the menu options and returns the selected option.
+
+
+    Returns:
+    - option (int): the option the user selects
+   
+    """
+    while True:
+        try:
+            option = int(input("\nPlease select an option: (or type 0 to restart)"
+                    "\n\t1. Average number of threatened species"
+                    "\n\t2. The change in population over time"
+                    "\n\t3. Population density"
+                    "\n\t4. Find which country in the selected region has the min/max number of threatened plants"
+                    "\n>> "))
+   
+            if option in (0, 1, 2, 3, 4):
+                return int(option)
+            else:
+                dp.invalid_input()
+        except ValueError:
+            dp.invalid_input()
+
+
+def handle_options(option, region_name, country_name):
+    """
+    A function that handles the option that the user selects by calling other functions.
+
+
+    Parameters:
+    - option (int): the option the user selected
+    - region_name (string): the name of the sub region
+    - country_name (String): the name of the country
+   
+    """
+    if option == 1:
+        print(f"\nCalculating average number of threatened species in the {region_name} and in {country_name}...")
+        dp.avg_endangered_species(region_name, country_name)
+   
+    elif option == 2:
+        print(f"\nAnalyzing population change over time for {country_name}...")
+        dp.calculate_population_time(country_name, region_name)
+   
+    elif option == 3:
+        year = int(input("\nWhich year? (Input a year from 2000 to 2020): "))
+        print(f"\nCalculating population density for the year {year} for {country_name}...")
+        dp.calculate_population_density(year, country_name)
+   
+    elif option == 4:
+        user_input = input("\nMin or max? ").lower() # Accepts all mIn MIN and stores it as min
+        if user_input != "max" and user_input != "min":
+            dp.invalid_input()
+            handle_options(option, region_name, country_name)
+        print(f"\nFinding the country with the {user_input} of threatened plants in {region_name}...")
+        dp.calculate_min_max(user_input, region_name)
+   
+    elif option not in (0,1,2,3,4):
+        dp.invalid_input()
+        handle_options(option, region_name, country_name) # Calls the function again recursively
+
+
+def main():
+    """
+    Runs the interactive menu until the user quits.
+    """
+    while True: # Program continues until the user ends it
+        # Gets the country data, it is only read from disk again if the file changes
+        country = datasets.load(datasets.COUNTRY_FILE)
+        region_name = (input("\nPlease enter a sub-region (or type 0 to quit): ")).title() # Capitalizes each first letter of the sub-region
+        if region_name == "0":
+            print("\nThank you for using our program!")
+            break # Exits out of the program
+
+
+        if region_name not in country.groups("UN Sub-Region"): # Checks if it is a valid region
+            dp.invalid_input()
+            continue # Restarts the loop
+
+
+        while True:
+            # Prompts the user for a country in the sub-region
+            country_name = (input("\nPlease enter a country in the sub-region (or type 0 to go back): ")).capitalize()
+       
+            if country_name == "0":
+                break
+       
+            # Finds the row for the entered country
+            country_row = country.index.get(country_name)
+            if country_row is None: # Country not found
+                dp.invalid_input()
+                continue # Restart inner loop
+
+
+            elif country.columns["UN Sub-Region"][country_row] != region_name: # If the country is not in the given region
+                print("\n--Country is not in region please try again--")
+                continue
+       
+            # Display options to user
+            option = print_options()
+       
+            if option == 0:
+                break
+       
+            handle_options(option, region_name, country_name)
+            break
+
+
+def run(argv):
+    """
+    Starts the menu from the command line.
+
+
+    Parameters:
+    - argv (list): the command line arguments, --profile prints how long each stage took when the program exits
+    """
+    if "--profile" in argv:
+        profiling.enable()
+    main()
+
+
+if __name__ == "__main__":
+    run(sys.argv[1:])
@@ -0,0 +1,302 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import datasets
+import timeseries
+
+
+PLOT_DIR = "final_plots"
+CACHE_DIR = os.path.join(PLOT_DIR, "cache") # Rendered graphs named after a hash of what they show
+CACHE_BYTES = 64 * 1024 * 1024 # The least recently used graphs are deleted once the cache is bigger than this
+SPECIES_COLORS = ["maroon", "red", "blue", "pink"] # One colour per species group, in the order of the species file
+
+
+def species_job(region_name, output=None):
+    """
+    Describes the bar graph of the threatened species in each country of a sub-region.
+
+
+    Parameters:
+    - region_name (string): name of the sub region
+    - output (string): where to save the graph, by default a file named after the sub region in PLOT_DIR
+
+
+    Returns:
+    - job (dict): everything needed to draw the graph, only made of plain lists and strings so it can be sent to another process
+    """
+    country = datasets.load(datasets.COUNTRY_FILE)
+    species = datasets.load(datasets.SPECIES_FILE)
+
+    country_list = country.columns["Country"][country.group("UN Sub-Region", region_name)].tolist()
+    rows = species.rows_for(country_list)
+    return {
+        "kind": "species",
+        "region": region_name,
+        "countries": country_list,
+        "series": {header: species.columns[header][rows].tolist() for header in species.headers[1:]},
+        "output": output or os.path.join(PLOT_DIR, f"species_{_slug(region_name)}.png"),
+    }
+
+
+def population_job(country_name, region_name, output=None):
+    """
+    Describes the two graphs of the population of a country over time and the latest population of each country in its sub-region.
+
+
+    Parameters:
+    - country_name (string): name of the country
+    - region_name (string): name of the sub region
+    - output (string): where to save the graphs, by default a file named after the country in PLOT_DIR
+
+
+    Returns:
+    - job (dict): everything needed to draw the graphs, see species_job
+    """
+    country = datasets.load(datasets.COUNTRY_FILE)
+    population = datasets.load(datasets.POPULATION_FILE)
+
+    # Pairs each year with its population and puts them in time order, the file lists the newest year first
+    years, year_headers = timeseries.year_headers(population)
+    index = population.index[country_name]
+
+    country_list = country.columns["Country"][country.group("UN Sub-Region", region_name)].tolist()
+    return {
+        "kind": "population",
+        "country": country_name,
+        "region": region_name,
+        "years": [str(year) for year in years.tolist()],
+        "populations": [float(population.columns[header][index]) for header in year_headers],
+        "countries": country_list,
+        "latest": population.columns[year_headers[-1]][population.rows_for(country_list)].tolist(),
+        "output": output or os.path.join(PLOT_DIR, f"population_{_slug(country_name)}.png"),
+    }
+
+
+def all_jobs():
+    """
+    Returns a species job for every sub-region and a population job for every country.
+    """
+    country = datasets.load(datasets.COUNTRY_FILE)
+    jobs = [species_job(region_name) for region_name in country.groups("UN Sub-Region")]
+    for country_name, region_name in zip(country.columns["Country"].tolist(), country.columns["UN Sub-Region"].tolist()):
+        jobs.append(population_job(country_name, region_name))
+    return jobs
+
+
+def figure_size(job):
+    """
+    Returns the size in inches of the figure a job is drawn on.
+    """
+    return [22, 10] if job["kind"] == "species" else [20, 15]
+
+
+def draw(figure, job):
+    """
+    Draws a job onto a matplotlib figure.
+
+
+    Parameters:
+    - figure (matplotlib Figure): an empty figure, either from pyplot or created headless
+    - job (dict): from species_job or population_job
+    """
+    if job["kind"] == "species":
+        _draw_species(figure, job)
+    elif job["kind"] == "population":
+        _draw_population(figure, job)
+    else:
+        raise ValueError(f"unknown plot kind {job['kind']!r}")
+
+
+def _draw_species(figure, job):
+    axes = figure.add_subplot(1, 1, 1)
+    x_axis = np.arange(len(job["countries"])) # Creates an array of evenly spaced numbers to be used for the x_axis postions for the bars in the chart
+    width = 0.2 # Sets the width of the bars in the chart
+    offset = (len(job["series"]) - 1) / 2 # Centres the group of bars on each country
+
+    for i, (label, values) in enumerate(job["series"].items()):
+        axes.bar(x_axis + (i - offset) * width, values, color=SPECIES_COLORS[i % len(SPECIES_COLORS)], width=width, label=label)
+
+    axes.set_title(f"Endangered Species in {job['region']}", fontsize = 20, fontweight = "bold")
+    axes.set_xlabel("Countries")
+    axes.set_ylabel("Number of Species")
+    axes.set_xticks(x_axis, job["countries"]) # Will show the names of the countries instead of like 1, 2, 3 at positions specified by x_axis
+    axes.legend()
+
+
+def _draw_population(figure, job):
+    axes = figure.add_subplot(2, 1, 1)
+    axes.plot(job["years"], job["populations"])
+    axes.set_title(f"Population as a Function of Time for {job['country']} throughout {job['years'][0]} to {job['years'][-1]}",
+                   fontsize = 14, fontweight = "bold")
+    axes.set_xlabel("Time (year)", fontsize = 14)
+    axes.set_ylabel("Population (people)", fontsize = 14)
+
+    axes = figure.add_subplot(2, 1, 2)
+    x_axis = np.arange(len(job["countries"]))
+    axes.bar(x_axis, job["latest"])
+    axes.set_xticks(x_axis, job["countries"])
+    axes.set_xlabel("Countries", fontsize = 14)
+    axes.set_ylabel("Population (people)", fontsize = 14)
+    axes.set_title(f"Population of Each Country in {job['region']}", fontsize = 14, fontweight = "bold")
+
+    figure.subplots_adjust(hspace = 0.5)
+
+
+def render(job):
+    """
+    Draws a job on the non-interactive Agg backend and saves it, without touching pyplot so it is safe in worker processes.
+
+
+    Parameters:
+    - job (dict): from species_job or population_job
+
+
+    Returns:
+    - output (string): the file the graph was saved to
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=figure_size(job))
+    FigureCanvasAgg(figure) # Attaches the Agg canvas to the figure
+    draw(figure, job)
+
+    directory = os.path.dirname(job["output"])
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    figure.savefig(job["output"])
+    return job["output"]
+
+
+def render_all(jobs, processes=None):
+    """
+    Renders many jobs across a pool of worker processes.
+
+
+    Parameters:
+    - jobs (list): the jobs to render, every job must have its own output file
+    - processes (int): number of worker processes, by default one per core
+
+
+    Returns:
+    - outputs (list): the file of each job, in the same order as jobs
+    """
+    outputs = [job["output"] for job in jobs]
+    if len(set(outputs)) != len(outputs):
+        raise ValueError("every plot job needs its own output file")
+
+    if processes == 1 or len(jobs) <= 1: # Not worth starting a pool
+        return [render(job) for job in jobs]
+
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(render, jobs, chunksize=max(1, len(jobs) // (4 * (processes or os.cpu_count() or 1)))))
+
+
+def job_key(job):
+    """
+    Returns a hash of everything a job draws, so two jobs with the same key produce the same graph.
+    The output file is left out of the hash.
+
+
+    Parameters:
+    - job (dict): from species_job or population_job
+    """
+    content = {key: value for key, value in job.items() if key != "output"}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode("utf-8")).hexdigest()[:24]
+
+
+def cached_render(job):
+    """
+    Renders a job into the plot cache, or returns the cached graph if the same one has been rendered before.
+
+
+    Parameters:
+    - job (dict): from species_job or population_job, its output is ignored
+
+
+    Returns:
+    - path (string): the cached graph
+    """
+    path = os.path.join(CACHE_DIR, f"{job['kind']}_{job_key(job)}.png")
+    try:
+        os.utime(path) # Marks it as recently used
+        return path
+    except FileNotFoundError: # Not rendered yet, or evicted by another process just now
+        pass
+
+    temporary = f"{path}.{os.getpid()}.tmp.png" # Rendered to the side and moved in so nobody sees half a file
+    render(dict(job, output=temporary))
+    os.replace(temporary, path)
+    evict_cache(keep=path)
+    return path
+
+
+def evict_cache(max_bytes=None, keep=None):
+    """
+    Deletes the least recently used graphs until the plot cache fits in its size budget.
+
+
+    Parameters:
+    - max_bytes (int): the size budget, CACHE_BYTES by default
+    - keep (string): a graph that is never deleted, like the one that was just rendered
+    """
+    if max_bytes is None:
+        max_bytes = CACHE_BYTES
+    try:
+        names = os.listdir(CACHE_DIR)
+    except FileNotFoundError:
+        return
+
+    entries = []
+    for name in names:
+        if name.endswith(".tmp.png"): # Still being rendered by some process, which moves it in place itself
+            continue
+        path = os.path.join(CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError: # Deleted by another process in the meantime
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(entry[1] for entry in entries)
+    for mtime, size, path in sorted(entries): # Oldest use first
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+
+
+def _slug(name):
+    """
+    Turns a country or sub-region name into something safe to use in a file name.
+    """
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_")
+
+
+def main(argv=None):
+    """
+    Command line entry point that renders the graphs of every sub-region and every country.
+    """
+    parser = argparse.ArgumentParser(description="Renders the species graph of every sub-region and the population graphs of every country.")
+    parser.add_argument("--processes", type=int, default=None, help="number of worker processes (default: one per core)")
+    parser.add_argument("--kind", choices=["species", "population"], help="only render this kind of graph")
+    args = parser.parse_args(argv)
+
+    jobs = [job for job in all_jobs() if args.kind in (None, job["kind"])]
+    outputs = render_all(jobs, args.processes)
+    print(f"Rendered {len(outputs)} graphs into {PLOT_DIR}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+
+ENV_VAR = "DA_PROFILE" # Set to 1 to print a report when the program exits, or to a .json path to also save it there
+
+_enabled = False
+_dump_path = None
+_stats = {} # Maps a stage name to [calls, seconds, allocated bytes]
+_open_stages = [] # The stages that are currently running, innermost last
+_NOT_PROFILING = contextlib.nullcontext() # Handed out by stage() while profiling is off so nothing is allocated
+
+
+def enable(dump_path=None):
+    """
+    Turns profiling on for the rest of the session and prints a report when the program exits.
+
+
+    Parameters:
+    - dump_path (string): if given the report is also saved to this JSON file
+    """
+    global _enabled, _dump_path
+    if dump_path is not None:
+        _dump_path = dump_path
+    if _enabled:
+        return
+    _enabled = True
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+    atexit.register(_report_at_exit)
+
+
+def is_enabled():
+    """
+    Returns True if profiling is on.
+    """
+    return _enabled
+
+
+class _Stage:
+    """
+    Context manager that adds the time and memory of one run of a stage to its totals.
+    The allocated bytes are the most memory the stage had allocated at any point while it ran, nested stages included.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        current, peak = tracemalloc.get_traced_memory()
+        if _open_stages: # Remembers the outer stage's peak before the peak counter is reset for this one
+            parent = _open_stages[-1]
+            parent.peak = max(parent.peak, peak)
+        tracemalloc.reset_peak()
+        self.start_bytes = current
+        self.peak = current
+        _open_stages.append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = time.perf_counter() - self.start
+        self.peak = max(self.peak, tracemalloc.get_traced_memory()[1])
+        _open_stages.pop()
+        if _open_stages:
+            _open_stages[-1].peak = max(_open_stages[-1].peak, self.peak)
+
+        totals = _stats.setdefault(self.name, [0, 0.0, 0])
+        totals[0] += 1
+        totals[1] += seconds
+        totals[2] += self.peak - self.start_bytes
+        return False
+
+
+def stage(name):
+    """
+    Times a block of code as a named stage, for example "load" or "species_averages.lookup".
+    Costs a single check when profiling is off.
+
+
+    Parameters:
+    - name (string): name of the stage in the report
+
+
+    Returns:
+    - a context manager to use in a with statement
+    """
+    if not _enabled:
+        return _NOT_PROFILING
+    return _Stage(name)
+
+
+def profiled(name):
+    """
+    Decorator that records every call of a function as a stage.
+
+
+    Parameters:
+    - name (string): name of the stage in the report
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with _Stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def stats():
+    """
+    Returns the totals of every stage so far.
+
+
+    Returns:
+    - (dict): maps each stage name to a dict with "calls", "seconds" and "allocated_bytes"
+    """
+    return {name: {"calls": calls, "seconds": seconds, "allocated_bytes": allocated}
+            for name, (calls, seconds, allocated) in _stats.items()}
+
+
+def report(file=None):
+    """
+    Prints the totals of every stage as a table, slowest stage first.
+
+
+    Parameters:
+    - file (file): where to print, standard error by default
+    """
+    file = file or sys.stderr
+    rows = sorted(stats().items(), key=lambda item: item[1]["seconds"], reverse=True)
+    width = max([len("Stage")] + [len(name) for name, totals in rows])
+
+    print(f"\n{'Stage':<{width}}   {'Calls':>8}   {'Total (s)':>10}   {'Per call (ms)':>13}   {'Allocated (MB)':>14}", file=file)
+    print("-" * (width + 58), file=file)
+    for name, totals in rows:
+        per_call = totals["seconds"] / totals["calls"] * 1000
+        print(f"{name:<{width}}   {totals['calls']:>8}   {totals['seconds']:>10.4f}   {per_call:>13.3f}   "
+              f"{totals['allocated_bytes'] / 1e6:>14.2f}", file=file)
+
+
+def dump(path):
+    """
+    Saves the totals of every stage to a JSON file.
+
+
+    Parameters:
+    - path (string): name of the JSON file
+    """
+    with open(path, "w") as f:
+        json.dump(stats(), f, indent=2)
+
+
+def reset():
+    """
+    Forgets every total recorded so far.
+    """
+    _stats.clear()
+
+
+def _report_at_exit():
+    if not _stats:
+        return
+    report()
+    if _dump_path:
+        dump(_dump_path)
+
+
+# Turns profiling on straight away if the environment variable asks for it
+if os.environ.get(ENV_VAR, "") not in ("", "0"):
+    _value = os.environ[ENV_VAR]
+    enable(_value if _value.lower().endswith(".json") else None)
@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+
+import user_csv as us
+import datasets
+import categories
+import profiling
+
+
+AGGREGATES = {
+    "sum": np.nansum,
+    "mean": np.nanmean,
+    "min": np.nanmin,
+    "max": np.nanmax,
+    "count": lambda values: np.count_nonzero(~np.isnan(values)),
+}
+
+
+class Query:
+    """
+    A lazy query over one of the data files. Nothing is read until collect or aggregate is called, and then only the
+    selected columns of the matching rows are parsed. If the file is already loaded the query runs on the loaded
+    columns instead of reading it again.
+
+    Each method returns a new query, so a query can be built up step by step and reused:
+
+        western_europe = Query(datasets.SPECIES_FILE).region("Western Europe")
+        western_europe.select("Country", "Mammals").collect()
+        western_europe.aggregate("max")
+
+    Attributes:
+    - name (string): name of the file in DATA_DIR
+    - headers (tuple): the selected columns, None for every column
+    - filters (tuple): (header, values) pairs a row has to match
+    - regions (tuple): sub-regions the countries have to be in, None for every sub-region
+    """
+
+    def __init__(self, name, headers=None, filters=(), regions=None):
+        self.name = name
+        self.headers = headers
+        self.filters = filters
+        self.regions = regions
+
+    def _with(self, **changes):
+        fields = {"headers": self.headers, "filters": self.filters, "regions": self.regions}
+        fields.update(changes)
+        return Query(self.name, **fields)
+
+    def select(self, *headers):
+        """
+        Keeps only the given columns.
+        """
+        return self._with(headers=tuple(headers))
+
+    def filter(self, header, *values):
+        """
+        Keeps only the rows that have one of the values in a column. Numbers match however they are written,
+        so filter("Mammals", 5) keeps cells of "5" and "5.0" alike, see user_csv.cell_matches.
+        """
+        return self._with(filters=self.filters + ((header, frozenset(str(value) for value in values)),))
+
+    def country(self, *names):
+        """
+        Keeps only the rows of the given countries.
+        """
+        return self.filter("Country", *names)
+
+    def region(self, *names):
+        """
+        Keeps only the countries in the given UN sub-regions. Files without a sub-region column are matched through
+        the countries of the country data file.
+        """
+        regions = frozenset(names) if self.regions is None else self.regions & frozenset(names)
+        return self._with(regions=regions)
+
+    def collect(self):
+        """
+        Runs the query.
+
+
+        Returns:
+        - columns (dict): maps each selected header to a NumPy array of the matching rows, in file order
+        """
+        filters = list(self.filters)
+        if self.regions is not None:
+            filters.append(self._region_filter())
+
+        with profiling.stage("query.collect"):
+            dataset = datasets.cached(self.name)
+            if dataset is not None: # Already in memory, so filtering the loaded columns is quicker than parsing
+                return _filter_dataset(dataset, self.headers, filters)
+            return us.scan_columns(os.path.join(datasets.DATA_DIR, self.name), self.headers, filters)
+
+    def aggregate(self, how="mean"):
+        """
+        Runs the query and summarises every selected numeric column, skipping missing values.
+
+
+        Parameters:
+        - how (string): "sum", "mean", "min", "max" or "count"
+
+
+        Returns:
+        - (dict): maps each numeric header to its summary, NaN for a column without any values
+        """
+        if how not in AGGREGATES:
+            raise ValueError(f"how must be one of {', '.join(AGGREGATES)}")
+        result = {}
+        for header, column in self.collect().items():
+            if column.dtype != np.float64:
+                continue
+            if how != "count" and np.isnan(column).all(): # nanmin and friends warn on an empty or all NaN column
+                result[header] = float("nan")
+            else:
+                result[header] = float(AGGREGATES[how](column))
+        return result
+
+    def _region_filter(self):
+        """
+        Turns the sub-region restriction into a filter on this file.
+        """
+        if self.name == datasets.COUNTRY_FILE:
+            return ("UN Sub-Region", self.regions)
+        countries = Query(datasets.COUNTRY_FILE).select("Country").region(*self.regions).collect()
+        return ("Country", frozenset(countries["Country"].tolist()) if countries else frozenset())
+
+
+def _filter_dataset(dataset, headers, filters):
+    """
+    Runs a query on a loaded dataset, matching values the same way user_csv.scan_columns does so the answer does not
+    depend on whether the file was loaded. Categorical columns are filtered on their codes.
+    """
+    keep = np.ones(len(dataset), dtype=bool)
+    for header, values in filters:
+        texts, numbers = us.filter_values(values)
+        column = dataset.columns[header]
+        if column.dtype == np.float64:
+            matches = np.isin(column, list(numbers))
+            if "" in texts: # An empty cell was parsed as NaN
+                matches |= np.isnan(column)
+        elif isinstance(column, categories.Categorical) and not numbers: # Only exact text can match, so the codes are looked up
+            matches = np.isin(column.codes, [column.dictionary.code(text) for text in texts])
+        elif isinstance(column, categories.Categorical):
+            present = np.unique(column.codes) # Each distinct value is only checked once
+            wanted = [code for code, text in zip(present.tolist(), column.dictionary.values[present].tolist())
+                      if us.cell_matches(text, texts, numbers)]
+            matches = np.isin(column.codes, wanted)
+        else:
+            distinct, inverse = np.unique(column, return_inverse=True)
+            wanted = np.array([us.cell_matches(text, texts, numbers) for text in distinct.tolist()], dtype=bool)
+            matches = wanted[inverse.ravel()]
+        keep &= matches
+    rows = np.flatnonzero(keep)
+    return {header: np.asarray(dataset.columns[header][rows]) for header in (headers or dataset.headers)}
@@ -0,0 +1,108 @@
+import numpy as np
+
+import datasets
+import categories
+import profiling
+
+
+_summary = {} # The last summary, see datasets.derived
+
+
+def region_summary():
+    """
+    Computes the threatened species statistics of every country and every UN sub-region in one vectorized pass.
+    The summary is only computed again after the country or species data changes.
+
+
+    Returns:
+    - summary (dict) with the keys:
+        - "countries" (NumPy array): country names in the order of the country data file
+        - "country_codes" (NumPy array): the sub-region code of each country
+        - "totals" (NumPy array): total number of threatened species of each country, NaN if it has no species data
+        - "means" (NumPy array): average number of threatened species per species group of each country
+        - "regions" (NumPy array): sub-region names, indexed by sub-region code
+        - "region_codes" (dict): maps each sub-region name to its code
+        - "region_counts" (NumPy array): number of countries with species data in each sub-region
+        - "region_mean" (NumPy array): average of the country means in each sub-region
+        - "region_min" / "region_max" (NumPy array): smallest / largest country total in each sub-region
+        - "region_argmin" / "region_argmax" (NumPy array): index into countries of the country with the
+          smallest / largest total, the first one in file order if there is a tie
+    """
+    country = datasets.load(datasets.COUNTRY_FILE)
+    species = datasets.load(datasets.SPECIES_FILE)
+    return datasets.derived(_summary, _compute_summary, country, species)
+
+
+@profiling.profiled("regions.summary")
+def _compute_summary(country, species):
+    """
+    Does the work for region_summary.
+
+
+    Parameters:
+    - country (Dataset): the country dataset
+    - species (Dataset): the threatened species dataset
+    """
+    countries = country.columns["Country"]
+    regions, codes = categories.factorize(country.columns["UN Sub-Region"]) # Numbers each sub-region in sorted order
+    num_regions = len(regions)
+
+    # Lines the species rows up with the country rows, countries without species data get row -1
+    species_rows = species.rows_of(countries)
+    has_data = species_rows >= 0
+
+    counts = np.column_stack([species.columns[header][species_rows] for header in species.headers[1:]])
+    totals = np.where(has_data, counts.sum(axis=1), np.nan) # Total of every country at once
+    means = totals / (len(species.headers) - 1)
+
+    # Per region mean of the country means
+    region_counts = np.bincount(codes[has_data], minlength=num_regions)
+    with np.errstate(invalid="ignore", divide="ignore"): # Regions without any species data get NaN
+        region_mean = np.bincount(codes[has_data], weights=means[has_data], minlength=num_regions) / region_counts
+
+    # Sorting by region and then by total puts the smallest and largest country of every region at the edges of its run.
+    # lexsort is stable so ties keep file order like np.argmin / np.argmax do. NaN sorts last so it is never picked.
+    starts = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=num_regions))[:-1]))
+    region_argmin = np.lexsort((totals, codes))[starts]
+    region_argmax = np.lexsort((-totals, codes))[starts]
+
+    return {
+        "countries": countries,
+        "country_codes": codes,
+        "totals": totals,
+        "means": means,
+        "regions": regions,
+        "region_codes": dict(zip(regions.tolist(), range(num_regions))),
+        "region_counts": region_counts,
+        "region_mean": region_mean,
+        "region_min": totals[region_argmin],
+        "region_max": totals[region_argmax],
+        "region_argmin": region_argmin,
+        "region_argmax": region_argmax,
+    }
+
+
+def world_report():
+    """
+    Prints the threatened species statistics of every sub-region as a table.
+    """
+    summary = region_summary()
+    headers = ["UN Sub-region", "Countries", "Average", "Least threatened", "Most threatened"]
+    rows = []
+    for code in range(len(summary["regions"])):
+        least = summary["region_argmin"][code]
+        most = summary["region_argmax"][code]
+        rows.append([summary["regions"][code], summary["region_counts"][code], f"{summary['region_mean'][code]:0.2f}",
+                     f"{summary['countries'][least]} ({summary['totals'][least]:g})",
+                     f"{summary['countries'][most]} ({summary['totals'][most]:g})"])
+
+    col_widths = [max(len(str(row[i])) for row in rows + [headers]) for i in range(len(headers))]
+    header_row = "   ".join(f"{headers[i]:<{col_widths[i]}}" for i in range(len(headers)))
+    print(header_row)
+    print("-" * len(header_row))
+    for row in rows:
+        print("   ".join(f"{str(row[i]):<{col_widths[i]}}" for i in range(len(row))))
+
+
+if __name__ == "__main__":
+    world_report()
@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qsl, urlsplit
+
+import datasets
+import regions
+import density
+import timeseries
+import plots
+import batch
+import memo
+import profiling
+
+
+# Maps each endpoint to the menu option it answers
+ENDPOINTS = {
+    "/species_averages": 1,     # avg_endangered_species
+    "/population_change": 2,    # calculate_population_time
+    "/population_density": 3,   # calculate_population_density
+    "/species_extreme": 4,      # calculate_min_max
+}
+MAX_HEADER_BYTES = 16 * 1024 # Requests with a longer request line and headers are turned away
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+class Server:
+    """
+    A small HTTP server that answers the four analyses of the menu as JSON, keeping every dataset loaded between requests.
+
+    The analyses run one at a time on a single worker thread, so the shared datasets and results are never used by
+    two threads at once, while the event loop keeps accepting and reading other requests.
+    Graphs are drawn in a pool of worker processes.
+
+    Attributes:
+    - queries (ThreadPoolExecutor): the thread the analyses run on
+    - renderers (ProcessPoolExecutor): the processes graphs are drawn in
+    """
+
+    def __init__(self, processes=None):
+        self.queries = ThreadPoolExecutor(max_workers=1)
+        self.renderers = ProcessPoolExecutor(max_workers=processes)
+
+    def warm(self):
+        """
+        Loads the data files and computes the shared results up front, so the first request is as quick as the rest.
+        """
+        for name in (datasets.COUNTRY_FILE, datasets.POPULATION_FILE, datasets.SPECIES_FILE):
+            datasets.load(name)
+        regions.region_summary()
+        density.density_matrix()
+        timeseries.population_matrix()
+
+    def close(self):
+        self.queries.shutdown()
+        self.renderers.shutdown()
+
+    async def handle(self, reader, writer):
+        """
+        Answers one HTTP request on a connection and closes it.
+        """
+        try:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.LimitOverrunError:
+                await self.respond(writer, 400, {"error": "request headers are too long"})
+                return
+            except asyncio.IncompleteReadError: # The client went away
+                return
+
+            try:
+                method, target, _ = head.decode("latin-1").split("\r\n", 1)[0].split(" ", 2)
+            except ValueError:
+                await self.respond(writer, 400, {"error": "malformed request line"})
+                return
+            if method != "GET":
+                await self.respond(writer, 405, {"error": "only GET is supported"})
+                return
+
+            url = urlsplit(target)
+            status, body = await self.answer(url.path, dict(parse_qsl(url.query)))
+            await self.respond(writer, status, body)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def answer(self, path, query):
+        """
+        Works out the response to a request.
+
+
+        Parameters:
+        - path (string): the path of the URL, for example "/population_change"
+        - query (dict): the parameters of the URL: region, country, year, extreme
+
+
+        Returns:
+        - (tuple): the HTTP status and the JSON body
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            if path in ENDPOINTS:
+                query["option"] = ENDPOINTS[path]
+                return 200, await loop.run_in_executor(self.queries, run_query, query)
+            elif path == "/plot":
+                job = await loop.run_in_executor(self.queries, plot_job, query)
+                output = await loop.run_in_executor(self.renderers, plots.cached_render, job) # Drawn off the event loop
+                return 200, {"path": os.path.abspath(output)}
+            elif path == "/health":
+                return 200, {"status": "ok"}
+            elif path == "/stats": # How often each analysis was answered from memory
+                return 200, await loop.run_in_executor(self.queries, memo.stats)
+            return 404, {"error": f"unknown endpoint {path}", "endpoints": list(ENDPOINTS) + ["/plot", "/health", "/stats"]}
+        except ValueError as e:
+            return 400, {"error": str(e)}
+        except KeyError as e: # The country is missing from one of the other data files
+            return 404, {"error": f"no data for {e}"}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+
+    async def respond(self, writer, status, body):
+        """
+        Writes a JSON response.
+        """
+        data = json.dumps(batch.clean(body)).encode("utf-8")
+        writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                     f"Content-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode("latin-1") + data)
+        await writer.drain()
+
+
+def run_query(query):
+    """
+    Runs an analysis for a request, see batch.run_query. The sub-region can be left out when a country is given.
+    """
+    with profiling.stage("server.query"):
+        _fill_region(query)
+        return batch.run_query(query)
+
+
+def plot_job(query):
+    """
+    Describes the graph a /plot request asks for: the population graphs of a country if one is given,
+    otherwise the species graph of the sub-region.
+
+    Raises ValueError if the country or sub-region is not known.
+    """
+    _fill_region(query)
+    country = datasets.load(datasets.COUNTRY_FILE)
+    region_name = query.get("region")
+    country_name = query.get("country")
+    if region_name not in country.groups("UN Sub-Region"):
+        raise ValueError(f"unknown sub-region {region_name!r}")
+    if country_name is None:
+        return plots.species_job(region_name)
+    return plots.population_job(country_name, region_name)
+
+
+def _fill_region(query):
+    """
+    Adds the sub-region of the country to a query that does not name one.
+    """
+    country = datasets.load(datasets.COUNTRY_FILE)
+    if "region" not in query and query.get("country") in country.index:
+        query["region"] = str(country.columns["UN Sub-Region"][country.index[query["country"]]])
+
+
+async def serve(host="127.0.0.1", port=8000, socket_path=None, processes=None):
+    """
+    Runs the server until it is stopped.
+
+
+    Parameters:
+    - host (string), port (int): where to listen for TCP connections
+    - socket_path (string): listen on this Unix socket instead
+    - processes (int): number of processes to draw graphs with, by default one per core
+    """
+    server = Server(processes)
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(server.queries, server.warm)
+
+    stopping = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM): # Stops cleanly so the profiling report still gets printed
+        try:
+            loop.add_signal_handler(signal_number, stopping.set)
+        except (NotImplementedError, RuntimeError): # Not supported on Windows, Ctrl+C still works there
+            pass
+    try:
+        if socket_path is not None:
+            listener = await asyncio.start_unix_server(server.handle, path=socket_path, limit=MAX_HEADER_BYTES)
+            print(f"Listening on {socket_path}", flush=True)
+        else:
+            listener = await asyncio.start_server(server.handle, host, port, limit=MAX_HEADER_BYTES)
+            print(f"Listening on http://{host}:{port}", flush=True)
+        async with listener:
+            await stopping.wait()
+    finally:
+        server.close()
+        if socket_path is not None and os.path.exists(socket_path):
+            os.remove(socket_path)
+
+
+def main(argv=None):
+    """
+    Command line entry point, run python server.py --help for the arguments.
+    """
+    parser = argparse.ArgumentParser(description="Serves the analyses of the menu as JSON over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on (default: 8000)")
+    parser.add_argument("--socket", help="listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--processes", type=int, help="number of processes to draw graphs with (default: one per core)")
+    parser.add_argument("--profile", action="store_true", help="print how long each stage took when the server stops")
+    args = parser.parse_args(argv)
+    if args.profile:
+        profiling.enable()
+
+    try:
+        asyncio.run(serve(args.host, args.port, args.socket, args.processes))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import io
+import json
+
+import pytest
+
+import batch
+
+
+pytestmark = pytest.mark.usefixtures("repo_data")
+
+
+def _run(lines, tmp_path):
+    path = tmp_path / "queries.jsonl"
+    path.write_text("\n".join(lines) + "\n")
+    output = io.StringIO()
+    counts = batch.run_batch(batch.read_queries(str(path)), output)
+    return counts, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+def test_bad_lines_are_reported_and_the_rest_still_run(tmp_path):
+    counts, results = _run([
+        '{"option": 3, "region": "Western Europe", "country": "France", "year": 1e999}',
+        '{"option": 1e999, "region": "Western Europe"}',
+        '{"region": "Western Europe", "country": ["France"], "option": 2}',
+        '[1, 2]',
+        'not json',
+        '{"option": 1, "region": "Western Europe"}',
+    ], tmp_path)
+
+    assert counts == (1, 5)
+    assert [("error" in result) for result in results] == [True] * 5 + [False]
+    assert results[0]["query"]["year"] is None # Infinity is not valid JSON
+    assert results[-1]["result"]["region"] == "Western Europe"
+
+
+def test_unexpected_error_becomes_an_error_line(tmp_path, monkeypatch):
+    def broken(region_name):
+        raise RuntimeError("broken")
+    monkeypatch.setattr(batch.dp, "species_averages", broken)
+
+    counts, results = _run(['{"option": 1, "region": "Western Europe"}'] * 2, tmp_path)
+
+    assert counts == (0, 2)
+    assert results[0]["error"] == "RuntimeError: broken"
@@ -0,0 +1,84 @@
+import numpy as np
+
+import user_csv as us
+import datasets
+import categories
+import benchmark
+
+
+def _slow_rows_of(dataset, keys):
+    """
+    Looks every key up in the dataset's index, which is what Dataset.rows_of does when the codes cannot be used.
+    """
+    return np.array([dataset.index.get(key, -1) for key in keys.tolist()], dtype=np.intp)
+
+
+def test_encode_and_decode():
+    column = categories.encode("Country", np.array(["France", "Spain", "France"]))
+
+    assert isinstance(column, categories.Categorical)
+    assert column.tolist() == ["France", "Spain", "France"]
+    assert (column == "France").tolist() == [True, False, True]
+    assert column.dictionary.code("Nowhere") == -1
+    assert categories.encode("Mammals", np.array([1.0, 2.0])).dtype == np.float64 # Not a categorical column
+
+
+def test_rebuild_keeps_values_and_drops_unused_strings():
+    kept = categories.encode("Country", np.array(["France", "Spain", "France"]))
+    dropped = categories.encode("Country", np.array(["Atlantis", "Spain"]))
+    old = categories.COUNTRIES
+
+    categories.rebuild([kept])
+
+    assert categories.COUNTRIES is not old and kept.dictionary is categories.COUNTRIES
+    assert kept.tolist() == ["France", "Spain", "France"]
+    assert categories.COUNTRIES.code("Atlantis") == -1
+    assert len(categories.COUNTRIES) == 2
+    assert dropped.tolist() == ["Atlantis", "Spain"] # Still decodes through the old dictionary
+    assert categories.encode("Country", np.array(["Spain"])).codes[0] == kept.codes[1] # New columns share the new codes
+
+
+def test_eviction_keeps_decoded_values_and_joins(data_dir, monkeypatch):
+    benchmark.generate_data(str(data_dir), 50)
+    us.write_csv(str(data_dir / "extra.csv"), [["Country", "Value"]] + [[f"Only Here {i}", i] for i in range(20)], True)
+    monkeypatch.setattr(datasets, "MAX_CACHE_BYTES", 1) # Only the most recently loaded dataset stays
+
+    extra = datasets.load("extra.csv").columns["Country"]
+    names = extra.tolist()
+    population = datasets.load(datasets.POPULATION_FILE) # Evicts extra.csv
+
+    assert list(datasets._cache) == [population.filename]
+    assert categories.COUNTRIES.code("Only Here 0") == -1
+    assert len(categories.COUNTRIES) == len(population)
+    assert extra.tolist() == names
+    expected = us.read_columns(population.filename)["Country"].tolist()
+    assert population.columns["Country"].tolist() == expected
+
+    monkeypatch.setattr(datasets, "MAX_CACHE_BYTES", 256 * 1024 * 1024)
+    country = datasets.load(datasets.COUNTRY_FILE)
+    assert country.columns["Country"].dictionary is population.columns["Country"].dictionary
+    keys = country.columns["Country"]
+    np.testing.assert_array_equal(population.rows_of(keys), _slow_rows_of(population, keys))
+    np.testing.assert_array_equal(datasets.load("extra.csv").rows_of(keys), np.full(len(keys), -1))
+
+
+def test_dictionaries_count_towards_the_cache_budget(data_dir, monkeypatch):
+    benchmark.generate_data(str(data_dir), 50)
+    datasets.load(datasets.COUNTRY_FILE)
+    datasets.load(datasets.SPECIES_FILE)
+
+    # Exactly enough for the columns, but not for the dictionaries as well
+    monkeypatch.setattr(datasets, "MAX_CACHE_BYTES", sum(dataset.nbytes for dataset in datasets._cache.values()))
+    datasets._evict()
+
+    assert len(datasets._cache) == 1
+
+
+def test_clear_empties_the_dictionaries(data_dir):
+    benchmark.generate_data(str(data_dir), 50)
+    datasets.load(datasets.COUNTRY_FILE)
+    assert categories.nbytes() > 0
+
+    datasets.clear()
+
+    assert categories.nbytes() == 0
@@ -0,0 +1,55 @@
+import pytest
+
+import user_csv as us
+import datasets
+import memo
+import design_project as dp
+
+
+calls = [] # The arguments total was really called with
+
+
+@memo.memoize("values.csv")
+def total(column, scale=1):
+    calls.append((column, scale))
+    return {"total": float(datasets.load("values.csv").columns[column].sum()) * scale}
+
+
+@pytest.fixture(autouse=True)
+def empty_memo():
+    memo.clear()
+    calls.clear()
+    yield
+    memo.clear()
+
+
+@pytest.fixture
+def values(data_dir):
+    us.write_csv(str(data_dir / "values.csv"), [["Country", "Value"], ["A", 1], ["B", 2]], True)
+
+
+def test_keyword_and_positional_arguments_share_a_result(values):
+    assert total("Value") == {"total": 3.0}
+    assert total(column="Value") == {"total": 3.0}
+    assert total("Value", 1) == {"total": 3.0}
+    assert total("Value", scale=2) == {"total": 6.0}
+
+    assert calls == [("Value", 1), ("Value", 2)]
+    assert memo.stats()["total"] == {"hits": 2, "misses": 2}
+
+
+def test_results_are_copies(values):
+    total("Value")["total"] = 0
+    assert total("Value") == {"total": 3.0}
+
+
+def test_appending_to_the_file_makes_the_result_stale(values):
+    assert total("Value") == {"total": 3.0}
+    datasets.append("values.csv", [["C", 4]])
+    assert total("Value") == {"total": 7.0}
+    assert len(calls) == 2
+
+
+def test_analyses_accept_keyword_arguments(repo_data):
+    assert dp.population_density(year=2010, country_name="France") == dp.population_density(2010, "France")
+    assert dp.species_averages(region_name="Western Europe") == dp.species_averages("Western Europe")
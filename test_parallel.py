@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+import user_csv as us
+from testing import HEADERS, species_rows, assert_same_columns
+
+
+@pytest.mark.parametrize("extra", [
+    [],
+    [['Korea, Republic of', "Region 1", "4", "1.5"]], # A quoted row
+    [["Country X", "Region 1", "n/a", "1"]], # Text late in a numeric column, so the ranges disagree on its type
+])
+def test_parallel_columns_equal_serial(tmp_path, monkeypatch, extra):
+    path = str(tmp_path / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(2000) + extra, True)
+    monkeypatch.setattr(us, "PARALLEL_MIN_BYTES", 0) # So even this small file is split between processes
+
+    assert_same_columns(us.read_columns(path, processes=2), us.read_columns(path, processes=1))
+
+
+def test_byte_ranges_start_on_lines(tmp_path):
+    path = str(tmp_path / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(500), True)
+    with open(path, "rb") as f:
+        f.readline()
+        start = f.tell()
+        data = f.read()
+
+    ranges = us._byte_ranges(path, start, os.path.getsize(path), 4)
+
+    assert ranges[0][0] == start and ranges[-1][1] == os.path.getsize(path)
+    for (_, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start
+        assert data[next_start - start - 1:next_start - start] == b"\n"
+
+
+@pytest.mark.skipif(not os.path.isdir("/dev/shm"), reason="needs /dev/shm to see the shared memory blocks")
+def test_failed_range_frees_shared_memory(tmp_path, monkeypatch):
+    path = str(tmp_path / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(2000) + [["Country X", "Region 1", "3"]], True) # The last row is short
+    monkeypatch.setattr(us, "PARALLEL_MIN_BYTES", 0)
+    before = set(os.listdir("/dev/shm"))
+
+    with pytest.raises(ValueError):
+        us.read_columns(path, processes=2)
+
+    assert set(os.listdir("/dev/shm")) - before == set()
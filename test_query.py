@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+import user_csv as us
+import datasets
+from query import Query
+from testing import assert_same_columns
+
+
+def _notes(data_dir):
+    """
+    Writes a file whose Note column is numeric in the rows of A but text in the rows of B.
+    """
+    us.write_csv(str(data_dir / "notes.csv"), [["Country", "Note"], ["A", "5"], ["B", "n/a"], ["A", ""]], True)
+    return Query("notes.csv")
+
+
+def test_column_type_does_not_depend_on_matching_rows(data_dir):
+    query = _notes(data_dir).country("A")
+
+    cold = query.collect() # No sidecar yet, so every row is checked
+    assert cold["Note"].dtype.kind == "U"
+    assert cold["Note"].tolist() == ["5", ""]
+
+    datasets.load("notes.csv")
+    assert_same_columns(query.collect(), cold)
+    datasets.clear()
+    assert_same_columns(query.collect(), cold) # Typed from the sidecar this time
+
+
+def test_column_type_when_nothing_matches(data_dir):
+    query = _notes(data_dir).country("C")
+
+    cold = query.collect()
+    assert cold["Note"].dtype.kind == "U" and len(cold["Note"]) == 0
+    datasets.load("notes.csv")
+    assert np.asarray(query.collect()["Note"]).dtype.kind == "U"
+
+
+QUERIES = [
+    Query(datasets.SPECIES_FILE).filter("Mammals", 5.0),
+    Query(datasets.SPECIES_FILE).filter("Mammals", "5"),
+    Query(datasets.SPECIES_FILE).region("Western Europe").select("Country", "Birds"),
+    Query(datasets.POPULATION_FILE).country("France", "Spain", "Nowhere"),
+    Query(datasets.COUNTRY_FILE).region("Western Europe", "Northern Europe").region("Western Europe"),
+    Query(datasets.SPECIES_FILE).filter("Country", "France", "Spain").filter("Country", "Spain"),
+    Query(datasets.SPECIES_FILE).filter("Country", "Nowhere"),
+]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_loaded_and_unloaded_files_give_the_same_answer(repo_data, query):
+    datasets.clear()
+    cold = query.collect()
+    datasets.load(query.name)
+    assert_same_columns(query.collect(), cold)
+    datasets.clear()
+
+
+def test_numbers_match_however_they_are_written(repo_data):
+    assert len(QUERIES[0].collect()["Mammals"]) == len(QUERIES[1].collect()["Mammals"]) > 0
+
+
+def test_aggregate(repo_data):
+    columns = Query(datasets.SPECIES_FILE).region("Western Europe").collect()
+    result = Query(datasets.SPECIES_FILE).region("Western Europe").aggregate("max")
+
+    assert "Country" not in result
+    assert result["Mammals"] == columns["Mammals"].max()
+    with pytest.raises(ValueError):
+        Query(datasets.SPECIES_FILE).aggregate("median")
@@ -0,0 +1,162 @@
+import os
+
+import pytest
+
+import user_csv as us
+import datasets
+from testing import HEADERS, species_rows, assert_same_columns
+
+
+def _no_parsing(monkeypatch):
+    """
+    Makes parsing a whole file fail, to check that only the tail of it is read.
+    """
+    def parse(*args, **kwargs):
+        raise AssertionError("the whole file was parsed")
+    monkeypatch.setattr(us, "_parse_columns", parse)
+
+
+def test_appended_rows_match_full_parse(data_dir):
+    path = str(data_dir / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(100), True)
+    dataset = datasets.load("species.csv")
+
+    appended = datasets.append("species.csv", [['Korea, Republic of', 'Eastern "Asia"', "3", ""]] + species_rows(20, 100))
+
+    assert appended is dataset # Extended in place rather than loaded again
+    assert appended.version == 1
+    assert len(appended) == 121
+    assert appended.columns["Country"][100] == "Korea, Republic of"
+    assert_same_columns(appended.columns, us.read_columns(path))
+
+
+def test_appended_rows_reload_from_sidecar(data_dir, monkeypatch):
+    path = str(data_dir / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(100), True)
+    datasets.load("species.csv")
+    datasets.append("species.csv", [['"Quoted", name', "Region 1", "7", "2.5"]])
+    expected = us.read_columns(path)
+
+    datasets.clear()
+    _no_parsing(monkeypatch)
+    assert_same_columns(datasets.load("species.csv").columns, expected)
+
+
+def test_rows_appended_by_another_process_are_added_to_sidecar(data_dir, monkeypatch):
+    path = str(data_dir / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(100), True)
+    datasets.load("species.csv")
+    datasets.clear() # As if the next load happened in a new process
+    us.write_csv(path, species_rows(10, 100) + [["A much longer country name", "Region 1", "", "2"]], False)
+    expected = us.read_columns(path)
+
+    _no_parsing(monkeypatch)
+    assert_same_columns(datasets.load("species.csv").columns, expected)
+    datasets.clear()
+    assert_same_columns(datasets.load("species.csv").columns, expected) # Straight from the updated sidecar
+
+
+def test_append_adds_to_sidecar_column_files(data_dir):
+    path = str(data_dir / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(100), True)
+    datasets.load("species.csv")
+    mammals = os.path.join(us.sidecar_path(path), "2.bin")
+    before = os.stat(mammals)
+
+    datasets.append("species.csv", species_rows(5, 100))
+
+    after = os.stat(mammals)
+    assert after.st_ino == before.st_ino # Added to, not written out again
+    assert after.st_size == before.st_size + 5 * 8
+
+
+def test_row_still_being_written_is_left_for_later(data_dir, monkeypatch):
+    path = str(data_dir / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(10), True)
+    datasets.load("species.csv")
+    with open(path, "a") as f:
+        f.write("Country 10,Region 3,1")
+    assert len(datasets.load("species.csv")) == 10
+
+    with open(path, "a") as f:
+        f.write("2,2.5\n")
+    expected = us.read_columns(path)
+    _no_parsing(monkeypatch)
+    dataset = datasets.load("species.csv")
+    assert dataset.columns["Mammals"][10] == 12
+    assert_same_columns(dataset.columns, expected)
+
+
+def test_append_to_file_without_trailing_newline(data_dir):
+    path = str(data_dir / "species.csv")
+    with open(path, "w") as f:
+        f.write("\n".join(",".join(row) for row in [HEADERS] + species_rows(10))) # No line break after the last row
+    datasets.load("species.csv")
+
+    dataset = datasets.append("species.csv", species_rows(5, 10))
+
+    assert len(dataset) == 15
+    assert_same_columns(dataset.columns, us.read_columns(path))
+
+
+def test_edited_row_then_append_reloads(data_dir):
+    path = str(data_dir / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(100), True)
+    datasets.load("species.csv")
+    with open(path, "r+b") as f: # Changes a row in the middle without changing the length of the file
+        data = f.read()
+        f.seek(data.index(b"Country 50,Region 1,0,"))
+        f.write(b"Country 50,Region 1,9,")
+    us.write_csv(path, species_rows(1, 100), False)
+
+    dataset = datasets.load("species.csv")
+
+    assert dataset.columns["Mammals"][50] == 9
+    assert_same_columns(dataset.columns, us.read_columns(path))
+    datasets.clear() # A new process reads the sidecar, which must not hold the old row either
+    assert datasets.load("species.csv").columns["Mammals"][50] == 9
+
+
+def test_text_appended_to_numeric_column_reloads(data_dir):
+    path = str(data_dir / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(10), True)
+    dataset = datasets.load("species.csv")
+
+    reloaded = datasets.append("species.csv", [["Country X", "Region 1", "unknown", "1"]])
+
+    assert reloaded is not dataset # Mammals is now a text column, so the whole file had to be parsed again
+    assert reloaded.columns["Mammals"].dtype.kind == "U"
+    assert_same_columns(reloaded.columns, us.read_columns(path))
+
+
+def test_write_csv_refuses_line_breaks(tmp_path):
+    path = str(tmp_path / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(3), True)
+    with open(path, "rb") as f:
+        before = f.read()
+
+    with pytest.raises(ValueError):
+        us.write_csv(path, [["Multi\nline", "Region 1", "3", "1"]], False)
+    with pytest.raises(ValueError):
+        us.write_csv(path, [["Carriage\rreturn", "Region 1", "3", "1"]], False)
+
+    with open(path, "rb") as f:
+        assert f.read() == before # Nothing was written
+
+
+def test_derived_result_is_recomputed_after_append(data_dir):
+    path = str(data_dir / "species.csv")
+    us.write_csv(path, [HEADERS] + species_rows(10), True)
+    cache = {}
+    def count(dataset):
+        return len(dataset)
+
+    dataset = datasets.load("species.csv")
+    assert datasets.derived(cache, count, dataset) == 10
+    cache["result"] = "kept" # Shows whether the next call computes it again
+    assert datasets.derived(cache, count, dataset) == "kept"
+
+    datasets.append("species.csv", species_rows(2, 10))
+    assert datasets.derived(cache, count, datasets.load("species.csv")) == 12
+    datasets.clear()
+    assert datasets.derived(cache, count, datasets.load("species.csv")) == 12 # A new dataset, so computed again
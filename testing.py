@@ -0,0 +1,29 @@
+import numpy as np
+
+
+# Shared helpers for the test modules
+
+HEADERS = ["Country", "UN Sub-Region", "Mammals", "Birds"]
+
+
+def species_rows(count, start=0):
+    """
+    Makes count rows of made up species data, in the order of HEADERS.
+
+    Parameters:
+    - count (int): number of rows
+    - start (int): number of the first row, so later rows can be appended
+    """
+    return [[f"Country {i}", f"Region {i % 7}", str(i % 50), "" if i % 11 == 0 else f"{i / 4}"]
+            for i in range(start, start + count)]
+
+
+def assert_same_columns(columns, expected):
+    """
+    Checks that two sets of columns have the same headers, types and values, NaN counting as equal to NaN.
+    """
+    assert list(columns) == list(expected)
+    for header in expected:
+        column, wanted = np.asarray(columns[header]), np.asarray(expected[header])
+        assert column.dtype.kind == wanted.dtype.kind, header
+        np.testing.assert_array_equal(column, wanted, err_msg=header)
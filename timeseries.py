@@ -0,0 +1,254 @@
+import argparse
+import re
+
+import numpy as np
+
+import datasets
+import categories
+import profiling
+
+
+_series = {} # The last population matrix, see datasets.derived
+
+
+def year_headers(population):
+    """
+    Finds the year columns of the population data from its headers, so columns can be added or moved.
+
+
+    Parameters:
+    - population (Dataset): the population dataset
+
+
+    Returns:
+    - (tuple): the years as a NumPy array, oldest first, and the header of each year in the same order
+    """
+    found = {}
+    for header in population.headers[1:]:
+        match = re.fullmatch(r"(\d{4}) Pop", header)
+        if match:
+            found[int(match.group(1))] = header
+    years = sorted(found)
+    return np.array(years, dtype=int), [found[year] for year in years]
+
+
+def population_matrix():
+    """
+    Puts the population of every country in every year into one matrix.
+    Built once per version of the population data, see datasets.derived.
+
+
+    Returns:
+    - matrix (dict) with the keys:
+        - "countries" (NumPy array): country names in the order of the population data file
+        - "years" (NumPy array): the years, oldest first
+        - "values" (NumPy array): the populations, one row per country and one column per year
+        - "country_rows" (dict): maps each country to its row
+        - "year_columns" (dict): maps each year to its column
+    """
+    return datasets.derived(_series, _build_matrix, datasets.load(datasets.POPULATION_FILE))
+
+
+@profiling.profiled("timeseries.matrix")
+def _build_matrix(population):
+    """
+    Does the work for population_matrix.
+    """
+    years, headers = year_headers(population)
+    values = np.column_stack([population.columns[header] for header in headers]) if headers else np.empty((len(population), 0))
+    values.flags.writeable = False
+    return {
+        "countries": population.columns["Country"],
+        "years": years,
+        "values": values,
+        "country_rows": population.index,
+        "year_columns": dict(zip(years.tolist(), range(len(years)))),
+    }
+
+
+def _columns(matrix, start_year, end_year):
+    """
+    Returns the columns of the first and last year of a period, the oldest and newest year by default.
+    Raises KeyError if there is no data for one of the years.
+    """
+    if len(matrix["years"]) == 0:
+        raise KeyError("there are no year columns in the population data")
+    start_year = matrix["years"][0] if start_year is None else start_year
+    end_year = matrix["years"][-1] if end_year is None else end_year
+    return matrix["year_columns"][int(start_year)], matrix["year_columns"][int(end_year)]
+
+
+def change(start_year=None, end_year=None):
+    """
+    Computes how much the population of every country changed over a period.
+
+
+    Parameters:
+    - start_year (int): first year of the period, the oldest year if None
+    - end_year (int): last year of the period, the newest year if None
+
+
+    Returns:
+    - (NumPy array): the end population minus the start population of each country, in the order of population_matrix
+    """
+    matrix = population_matrix()
+    start, end = _columns(matrix, start_year, end_year)
+    return matrix["values"][:, end] - matrix["values"][:, start]
+
+
+def percent_change(start_year=None, end_year=None):
+    """
+    Computes the change of every country over a period as a percentage of its start population, see change.
+    NaN where the start population is 0.
+    """
+    matrix = population_matrix()
+    start, end = _columns(matrix, start_year, end_year)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = (matrix["values"][:, end] - matrix["values"][:, start]) / matrix["values"][:, start] * 100
+    return np.where(np.isfinite(values), values, np.nan)
+
+
+def cagr(start_year=None, end_year=None):
+    """
+    Computes the compound annual growth rate of every country over a period, see change.
+
+
+    Returns:
+    - (NumPy array): the yearly rate as a fraction, 0.02 for 2% a year. NaN where it is not defined, for example
+      when a population is 0 or the period is empty.
+    """
+    matrix = population_matrix()
+    start, end = _columns(matrix, start_year, end_year)
+    span = matrix["years"][end] - matrix["years"][start]
+    if span <= 0:
+        return np.full(len(matrix["countries"]), np.nan)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        values = (matrix["values"][:, end] / matrix["values"][:, start]) ** (1 / span) - 1
+    return np.where(np.isfinite(values), values, np.nan)
+
+
+def yearly_growth():
+    """
+    Computes the growth of every country from each year to the next.
+
+
+    Returns:
+    - (tuple): the years the growth is measured up to, and the growth in percent with one row per country and one
+      column per year. When years are missing in between, the growth is averaged per year over the gap.
+    """
+    matrix = population_matrix()
+    values = matrix["values"]
+    gaps = np.diff(matrix["years"])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        growth = ((values[:, 1:] / values[:, :-1]) ** (1 / gaps) - 1) * 100
+    return matrix["years"][1:], np.where(np.isfinite(growth), growth, np.nan)
+
+
+def rolling_mean(window=5):
+    """
+    Computes the moving average population of every country over a window of consecutive year columns.
+
+
+    Parameters:
+    - window (int): number of year columns to average
+
+
+    Returns:
+    - (tuple): the last year of each window, and the averages with one row per country and one column per window.
+      Missing populations are left out of the average, which is NaN if the whole window is missing.
+    """
+    matrix = population_matrix()
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    values = matrix["values"]
+    if window > values.shape[1]:
+        return matrix["years"][:0], np.empty((len(values), 0))
+
+    # Differences of a running total give every window sum at once
+    present = ~np.isnan(values)
+    sums = _window_sums(np.where(present, values, 0), window)
+    counts = _window_sums(present.astype(np.float64), window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return matrix["years"][window - 1:], np.where(counts > 0, sums / counts, np.nan)
+
+
+def _window_sums(values, window):
+    """
+    Returns the sums of every run of window consecutive columns.
+    """
+    totals = np.cumsum(values, axis=1)
+    sums = totals[:, window - 1:].copy()
+    sums[:, 1:] -= totals[:, :-window]
+    return sums
+
+
+MEASURES = {"change": change, "percent": percent_change, "cagr": cagr}
+
+
+def top_movers(count=5, measure="cagr", start_year=None, end_year=None, shrinking=False):
+    """
+    Finds the fastest growing, or shrinking, countries in every UN sub-region.
+
+
+    Parameters:
+    - count (int): number of countries to keep per sub-region
+    - measure (string): "change", "percent" or "cagr"
+    - start_year, end_year (int): the period, see change
+    - shrinking (boolean): whether to find the countries that shrank the most instead
+
+
+    Returns:
+    - top (dict): maps each sub-region to a list of (country, value) pairs, the biggest mover first.
+      Countries without population data or without a value are left out.
+    """
+    if measure not in MEASURES:
+        raise ValueError(f"measure must be one of {', '.join(MEASURES)}")
+    values = MEASURES[measure](start_year, end_year)
+    matrix = population_matrix()
+    country = datasets.load(datasets.COUNTRY_FILE)
+
+    with profiling.stage("timeseries.top_movers"):
+        # Lines the values up with the country data, which is where the sub-regions are
+        names = country.columns["Country"]
+        rows = datasets.load(datasets.POPULATION_FILE).rows_of(names)
+        aligned = np.where(rows >= 0, values[rows], np.nan)
+        keep = np.flatnonzero(~np.isnan(aligned))
+
+        regions, codes = categories.factorize(country.columns["UN Sub-Region"].take(keep))
+        scores = aligned[keep] if shrinking else -aligned[keep]
+        order = np.lexsort((scores, codes)) # By sub-region, then biggest mover first, ties stay in file order
+        bounds = np.searchsorted(codes[order], np.arange(len(regions) + 1))
+
+        top = {}
+        for code in range(len(regions)):
+            picked = keep[order[bounds[code]:min(bounds[code] + count, bounds[code + 1])]]
+            top[regions[code]] = list(zip(names[picked].tolist(), aligned[picked].tolist()))
+    return top
+
+
+def main(argv=None):
+    """
+    Command line entry point that prints the fastest growing or shrinking countries of every sub-region.
+    """
+    parser = argparse.ArgumentParser(description="Prints the fastest growing or shrinking countries of every sub-region.")
+    parser.add_argument("--top", type=int, default=3, help="countries per sub-region")
+    parser.add_argument("--measure", choices=list(MEASURES), default="cagr", help="what to rank the countries by")
+    parser.add_argument("--start", type=int, help="first year of the period (default: oldest)")
+    parser.add_argument("--end", type=int, help="last year of the period (default: newest)")
+    parser.add_argument("--shrinking", action="store_true", help="rank the countries that shrank the most")
+    args = parser.parse_args(argv)
+
+    top = top_movers(args.top, args.measure, args.start, args.end, args.shrinking)
+    for region_name, movers in top.items():
+        print(f"\n{region_name}")
+        for country_name, value in movers:
+            if args.measure == "cagr":
+                print(f"    {country_name:<40} {value * 100:8.2f} % a year")
+            elif args.measure == "percent":
+                print(f"    {country_name:<40} {value:8.2f} %")
+            else:
+                print(f"    {country_name:<40} {value:14,.0f} people")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,25 @@
-import matplotlib.pyplot as plt
 import numpy as np
-import math
+import csv
+import hashlib
+import io
+import itertools
+import json
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
 
+import profiling
 
+
+SIDECAR_VERSION = 2 # Bump this whenever the layout of the sidecar files changes
+PARALLEL_MIN_BYTES = 16 * 1024 * 1024 # Smaller files are always parsed in a single process, starting workers would cost more
+HASH_CHUNK_BYTES = 1024 * 1024 # Files are hashed this many bytes at a time
+SCAN_CHUNK_LINES = 1000 # scan_columns splits this many lines at a time
+ENCODING = "utf-8-sig" # Like utf-8, but strips the byte order mark some of the files start with
+
+
+@profiling.profiled("csv.read_csv")
 def read_csv(filename, include_headers = True):
     """
     Reads CSV file and returns the contents in the form of a 2D list
@@ -17,30 +34,99 @@ def read_csv(filename, include_headers = True):
     You may not assume that the number of columns in each row is the same.
     If the data contains numerical values, the function should return them as floats, not strings. An example is provided below.
     """
-    f = open(filename, "r") # Opens the file and reads it
-    lines = f.read().splitlines() #  Reads the file and splits it into a list of lines
+    with open(filename, "r") as f: # Opens the file and closes it again once it has been read
+        lines = f.read().splitlines() #  Reads the file and splits it into a list of lines
 
 
-    data = [line.split(",") for line in lines] # Processes each line of the file splitting it up at each comma
+    data = _split_rows(lines) # Processes each line of the file splitting it up at each comma
    
     if include_headers == False: # Checks whether the flag, include_headers is false
         data = data[1:] # Removes the first row, the header
 
 
-    for row in range(len(data)): # Iterates through each row of data
-        for column in range(len(data[row])): # Iterates through each column
-            try: # This is a function that "tries" to convert the value to a float, if it can't it jumps to the except
-                data[row][column] = float(data[row][column])
-            except ValueError: # The value is not a float
-                pass # Keeps the value as a string i.e. does nothing
+    for row in data: # Iterates through each row of data
+        _convert_row(row)
 
 
     return data # Returns the processed data as a 2D list
 
 
+def iter_csv(filename, chunk_rows = 10000, include_headers = True):
+    """
+    Reads a CSV file lazily and yields its contents in batches of rows, so only one batch is held in memory at a time.
+
+    Parameters:
+        filename (string): name of the csv file with .csv at the end
+        chunk_rows (int): the maximum number of rows in each batch
+        include_headers (boolean): whether the header row is yielded as the first row of the first batch
+
+    Yields:
+        2D list: the next batch of rows, with numerical values converted to floats like read_csv
+    """
+    if chunk_rows < 1:
+        raise ValueError("chunk_rows must be at least 1")
+
+    with open(filename, "r", encoding=ENCODING, newline="") as f:
+        if not include_headers:
+            f.readline() # Skips the header
+
+        batch = []
+        for line in f: # Reads one line at a time instead of the whole file
+            line = line.rstrip("\r\n")
+            if line == "":
+                continue
+            batch.append(_convert_row(_split_rows([line])[0]))
+
+            if len(batch) == chunk_rows: # The batch is full so it is handed over and a new one is started
+                yield batch
+                batch = []
+
+        if batch: # Whatever is left over at the end of the file
+            yield batch
+
+
+def _split_rows(lines):
+    """
+    Splits lines into lists of cells at each comma. Lines with quotes in them are split by the csv module instead,
+    so a quoted cell can contain commas like the ones write_csv writes.
+
+    Parameters:
+        lines (list): the lines to split
+
+    Returns:
+        rows (list): the cells of each line as strings
+    """
+    if not any('"' in line for line in lines): # The usual case, nothing is quoted
+        return [line.split(",") for line in lines]
+    return [row for row in csv.reader(lines)]
+
+
+def _convert_row(row):
+    """
+    Converts every numerical value in a row to a float in place, leaving everything else as a string.
+
+    Parameters:
+        row (list): the cells of one row as strings
+
+    Returns:
+        row (list): the same row with its numerical values converted
+    """
+    for column in range(len(row)): # Iterates through each column
+        try: # This is a function that "tries" to convert the value to a float, if it can't it jumps to the except
+            row[column] = float(row[column])
+        except ValueError: # The value is not a float
+            pass # Keeps the value as a string i.e. does nothing
+    return row
+
+
+@profiling.profiled("csv.write_csv")
 def write_csv(filename, data, overwrite):
     """
     A function that overwrites or appends data to an existing file.
+    Cells with commas or quotes in them are quoted, and all the rows are written in a single write.
+    When appending to a file that does not end with a line break one is added first, so the new rows start on their own line.
+    Cells with line breaks in them are refused with a ValueError before anything is written, because every reader
+    in this module takes each line of a file to be one row.
 
 
     Parameters:
@@ -48,20 +134,722 @@ def write_csv(filename, data, overwrite):
         data (2D list): contains the data that will be written to csv file
         overwrite (boolean): indicates whether the function will overwrite or append to an existing file
     """
+    buffer = io.StringIO() # The rows are built up in memory and written in one go
+    csv.writer(buffer, lineterminator="\n").writerows(_single_line_rows(data)) # Quotes only the cells that need it
+    text = buffer.getvalue()
+
     if overwrite == True:
         parameter = "w" # Sets the paramter to "w" meaning that the user will overwrite the contents of the file
    
     else:
         parameter = "a" # Sets the parameter to "a" meaning that the user will add on to the end of the file
+        if not _ends_with_newline(filename):
+            text = "\n" + text
 
 
     with open(filename, parameter, newline = "") as file: # Opens the file with the parameter making sure no extra white spaces are added
-        for row in data: # Iterates through each row
-            line = ','.join(str(cell) for cell in row) # Iterates through each column in row
-            file.write(line + "\n")
+        file.write(text)
+
+
+def _single_line_rows(data):
+    """
+    Yields the rows of data, raising ValueError at the first cell with a line break in it.
+    """
+    for row in data:
+        for cell in row:
+            if isinstance(cell, str) and ("\n" in cell or "\r" in cell):
+                raise ValueError(f"cannot write {cell!r} to a csv file, cells must not contain line breaks")
+        yield row
+
+
+def _ends_with_newline(filename):
+    """
+    Returns True if a file is empty, missing or ends with a line break.
+    """
+    try:
+        with open(filename, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return True
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) == b"\n"
+    except FileNotFoundError:
+        return True
+
+
+@profiling.profiled("csv.read_columns")
+def read_columns(filename, cache = False, processes = 1):
+    """
+    Reads a CSV file with a header row and returns its contents column by column as typed NumPy arrays.
+
+    Parameters:
+        filename (string): name of the csv file with .csv at the end
+        cache (boolean): whether to use a binary sidecar next to the file, see load_columns.
+        processes (int): number of worker processes to parse the file with, None for one per core.
+            Files smaller than PARALLEL_MIN_BYTES are always parsed in this process.
+
+    Returns:
+        columns (dict): maps each header to a NumPy array holding that column, in file order.
+        Numeric columns are float64 arrays, every other column is a fixed width unicode array.
+        Columns loaded from a sidecar are read-only memory-mapped arrays.
+
+    Unlike read_csv every row must have the same number of columns as the header.
+    """
+    if not cache:
+        with profiling.stage("csv.parse"):
+            return _parse_columns(filename, processes)
+    return load_columns(filename, processes)[0]
+
+
+def load_columns(filename, processes = 1, stat = None):
+    """
+    Reads a CSV file into typed columns through a binary sidecar next to it. The first read writes the sidecar and
+    later reads memory-map it instead of parsing the text. The sidecar remembers how much of the file it holds and a
+    hash of those bytes, so when rows have only been appended since, even by another process, just those rows are
+    parsed and added to the end of the sidecar's column files.
+
+    Parameters:
+        filename (string): name of the csv file with .csv at the end
+        processes (int): number of worker processes, see read_columns
+        stat (os.stat_result): the stats of the file, taken before reading it, os.stat is called if None
+
+    Returns:
+        (tuple): the columns like read_columns returns them, the number of bytes of the file they hold, and the hex
+        digest of those bytes from hash_prefix
+    """
+    if stat is None:
+        stat = os.stat(filename) # Taken before reading so a change made in the meantime makes the sidecar stale
+    with profiling.stage("csv.load_sidecar"):
+        sidecar = _load_sidecar(filename)
+
+    if sidecar is not None:
+        schema, columns = sidecar
+        if schema["mtime_ns"] == stat.st_mtime_ns and schema["size"] == stat.st_size:
+            return columns, schema["offset"], schema["digest"]
+
+        with profiling.stage("csv.verify"):
+            hasher = verify_prefix(filename, schema["offset"], schema["digest"], stat.st_size)
+        if hasher is not None: # Only appended to, so the sidecar is still right as far as it goes
+            with profiling.stage("csv.read_tail"):
+                tail, offset = read_tail(filename, schema["offset"], schema["headers"], end=stat.st_size, hasher=hasher)
+            if tail_fits(columns, tail):
+                digest = hasher.hexdigest()
+                with profiling.stage("csv.write_sidecar"):
+                    appended = append_sidecar(filename, tail, stat, schema["digest"], offset, digest)
+                sidecar = _load_sidecar(filename) if appended else None
+                if sidecar is not None and sidecar[0]["digest"] == digest:
+                    return sidecar[1], offset, digest
+                # The sidecar could not be updated, so the new rows are joined on in memory instead
+                return {header: np.concatenate([columns[header], tail[header]]) for header in columns}, offset, digest
+
+    with profiling.stage("csv.parse"):
+        columns = _parse_columns(filename, processes)
+    with profiling.stage("csv.verify"):
+        hasher = hash_prefix(filename, stat.st_size)
+    digest = hasher.hexdigest() if hasher is not None else None # None if the file was cut short since, then it is never treated as appended
+    with profiling.stage("csv.write_sidecar"):
+        write_sidecar(filename, columns, stat, stat.st_size, digest)
+    return columns, stat.st_size, digest
+
+
+@profiling.profiled("csv.scan_columns")
+def scan_columns(filename, headers = None, where = None):
+    """
+    Reads only some of the columns and rows of a CSV file with a header row. Rows are filtered on the text of their
+    cells, the file is read a chunk of lines at a time and only the asked for cells of the matching rows are kept.
+
+    Parameters:
+        filename (string): name of the csv file with .csv at the end
+        headers (list): the columns to return, in this order, every column if None
+        where (dict): maps a header to the values a row must have in that column to be kept, for example
+            {"UN Sub-Region": ["Western Europe"]}. A row has to match every header. See cell_matches for how a value
+            is compared with a cell. A list of (header, values) pairs can be given instead, to filter a column twice.
+
+    Returns:
+        columns (dict): maps each header to a NumPy array of the matching rows. A column is typed like read_columns
+        would type it over the whole file, not just over the matching rows: the types come from the sidecar when it
+        is up to date, otherwise every row of the returned columns is checked.
+
+    Raises KeyError if one of the headers is not in the file.
+    """
+    stat = os.stat(filename)
+    schema = _read_schema(filename)
+    if schema is not None and (schema["mtime_ns"], schema["size"]) != (stat.st_mtime_ns, stat.st_size):
+        schema = None # Made from another version of the file
+
+    with open(filename, "r", encoding=ENCODING, newline="") as f:
+        lines = (line.rstrip("\r\n") for line in f)
+        lines = (line for line in lines if line != "") # Drops blank lines
+        header_line = next(lines, None)
+        if header_line is None:
+            return {}
+
+        file_headers = _split_rows([header_line])[0]
+        headers = file_headers if headers is None else list(headers)
+        pairs = (where or {}).items() if isinstance(where, dict) else where or []
+        where = [(header, filter_values(values)) for header, values in pairs]
+        for header in headers + [header for header, values in where]:
+            if header not in file_headers:
+                raise KeyError(header)
+
+        num_columns = len(file_headers)
+        indexes = [file_headers.index(header) for header in headers]
+        tests = [(file_headers.index(header), values) for header, values in where]
+        if schema is not None and schema["headers"] == file_headers:
+            numeric = {i: np.dtype(schema["dtypes"][i]).kind == "f" for i in indexes}
+            unknown = []
+        else: # Numeric until a cell that is not a number turns up
+            numeric = {i: True for i in indexes}
+            unknown = list(numeric)
+
+        matched = {i: [] for i in indexes} # The cells of the matching rows
+        while True:
+            chunk = list(itertools.islice(lines, SCAN_CHUNK_LINES)) # Only this many lines are held at a time
+            if not chunk:
+                break
+            unknown = [i for i in unknown if numeric[i]]
+            if not unknown: # Only the lines that can match have to be split
+                chunk = [line for line in chunk if _may_match(line, tests)]
+            cells = _split_cells(chunk, num_columns, filename)
+            for i in unknown:
+                numeric[i] = _convert_column(cells[i::num_columns]).dtype == np.float64
+
+            rows = range(len(cells) // num_columns)
+            for i, values in tests:
+                rows = [row for row in rows if cell_matches(cells[row * num_columns + i], *values)]
+            for i in indexes: # Only the columns that were asked for are kept, and only their matching cells
+                matched[i].extend(cells[row * num_columns + i] for row in rows)
+
+    columns = {}
+    for header, i in zip(headers, indexes):
+        if numeric[i]:
+            columns[header] = np.array([value if value != "" else "nan" for value in matched[i]], dtype=np.float64)
+        else:
+            columns[header] = np.array(matched[i], dtype=str)
+    return columns
+
+
+def _may_match(line, tests):
+    """
+    Checks a line against the filters of scan_columns, splitting it only as far as the filtered columns.
+    Lines with quotes in them and lines that are too short are kept, they are checked properly once they are split.
+
+    Parameters:
+        line (string): one line of the file
+        tests (list): (column index, wanted values from filter_values) pairs
+    """
+    if '"' in line:
+        return True
+    for i, values in tests:
+        parts = line.split(",", i + 1)
+        if len(parts) <= i:
+            return True
+        if not cell_matches(parts[i], *values):
+            return False
+    return True
+
+
+def filter_values(values):
+    """
+    Prepares the values of a filter for cell_matches.
+
+    Parameters:
+        values (iterable): the wanted values, as text
+
+    Returns:
+        (tuple): the set of texts and the set of the values that are numbers, as floats
+    """
+    texts = {str(value) for value in values}
+    numbers = set()
+    for text in texts:
+        try:
+            numbers.add(float(text))
+        except ValueError:
+            pass
+    return texts, numbers
+
+
+def cell_matches(cell, texts, numbers):
+    """
+    Checks whether a cell has one of the wanted values of a filter: either the same text, or the same number
+    written differently, so "5" matches a cell of "5.0". An empty value matches an empty cell.
+
+    Parameters:
+        cell (string): the text of the cell
+        texts, numbers (set): the wanted values, from filter_values
+    """
+    if cell in texts:
+        return True
+    if not numbers:
+        return False
+    try:
+        return float(cell) in numbers
+    except ValueError:
+        return False
+
+
+def sidecar_path(filename):
+    """
+    Returns the directory that holds the binary sidecar of a CSV file.
+
+    Parameters:
+        filename (string): name of the csv file
+    """
+    return filename + ".cache"
+
+
+def read_tail(filename, offset, headers, end = None, hasher = None):
+    """
+    Parses only the rows that were added to a CSV file after the first offset bytes had already been read,
+    for example by read_columns. Only complete lines are parsed, a row that is still being written is left for next time.
+
+    Parameters:
+        filename (string): name of the csv file with .csv at the end
+        offset (int): number of bytes already parsed, always the start of a line
+        headers (list): the headers of the file, the tail has no header row of its own
+        end (int): stop reading at this byte, the end of the file if None
+        hasher: the hash of the first offset bytes from verify_prefix, updated with the bytes that are parsed here
+
+    Returns:
+        (tuple): the new columns like read_columns returns them, and the offset up to which the file has now been parsed
+    """
+    with open(filename, "rb") as f:
+        f.seek(offset)
+        data = f.read() if end is None else f.read(max(0, end - offset))
+    complete = data.rfind(b"\n") + 1 # Just past the last line break, 0 if there is none
+    if hasher is not None:
+        hasher.update(data[:complete])
+    text = data[:complete].decode("utf-8")
 
+    lines = [line for line in text.splitlines() if line != ""]
+    cells = _split_cells(lines, len(headers), filename)
+    columns = {}
+    for i in range(len(headers)):
+        columns[headers[i]] = _convert_column(cells[i::len(headers)])
+    return columns, offset + complete
 
 
+def hash_prefix(filename, end):
+    """
+    Hashes the first end bytes of a file, so it can be told later whether they are still the same.
+
+    Parameters:
+        filename (string): name of the file
+        end (int): number of bytes to hash
+
+    Returns:
+        hasher (hashlib.blake2b): the hash, which can still be updated with the bytes that follow,
+        or None if the file is shorter than end bytes
+    """
+    hasher = hashlib.blake2b()
+    with open(filename, "rb") as f:
+        remaining = end
+        while remaining:
+            chunk = f.read(min(HASH_CHUNK_BYTES, remaining))
+            if not chunk:
+                return None
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher
 
 
+def verify_prefix(filename, offset, digest, size):
+    """
+    Checks whether a file has only grown since its first offset bytes were parsed: those bytes have to hash to the
+    same digest, and whatever was added has to start on a line of its own. Anything else, like an edited row,
+    means the file has to be parsed from scratch.
+
+    Parameters:
+        filename (string): name of the csv file
+        offset (int): number of bytes that were parsed
+        digest (string): hex digest of those bytes, see hash_prefix
+        size (int): the current size of the file
+
+    Returns:
+        hasher: the hash of the first offset bytes, to pass on to read_tail, or None if the file changed some other way
+    """
+    if digest is None or offset == 0 or size <= offset:
+        return None
+    try:
+        hasher = hash_prefix(filename, offset)
+        with open(filename, "rb") as f:
+            f.seek(offset - 1)
+            around = f.read(2) # The last parsed byte and the first new one
+    except OSError:
+        return None
+    if hasher is None or hasher.hexdigest() != digest:
+        return None
+    # write_csv starts the new rows with a line break when the file did not end with one
+    return hasher if b"\n" in around else None
+
+
+def tail_fits(columns, tail):
+    """
+    Checks whether rows parsed by read_tail can be added to the end of some columns: the headers have to be the same,
+    and every column has to be numeric in both or text in both. A tail without any rows always fits.
+
+    Parameters:
+        columns (dict): the columns so far
+        tail (dict): the new rows, from read_tail
+    """
+    if list(tail) != list(columns):
+        return False
+    if not tail or len(next(iter(tail.values()))) == 0:
+        return True
+    return all((columns[header].dtype == np.float64) == (tail[header].dtype == np.float64) for header in tail)
+
+
+def _read_schema(filename):
+    """
+    Returns the schema.json of the sidecar of a CSV file, or None if there is no usable one.
+    """
+    try:
+        with open(os.path.join(sidecar_path(filename), "schema.json"), "r") as f:
+            schema = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(schema, dict) or schema.get("version") != SIDECAR_VERSION:
+        return None
+    return schema
+
+
+def _write_schema(directory, schema):
+    """
+    Replaces the schema.json in a sidecar directory in one step, so a reader never sees half of it.
+    """
+    temporary = os.path.join(directory, f"schema.json.tmp-{os.getpid()}")
+    with open(temporary, "w") as f:
+        json.dump(schema, f)
+    os.replace(temporary, os.path.join(directory, "schema.json"))
+
+
+def _load_sidecar(filename):
+    """
+    Memory-maps the columns stored in the sidecar of a CSV file. It is up to the caller to check that the schema
+    still matches the file.
+
+    Parameters:
+        filename (string): name of the csv file
+
+    Returns:
+        (tuple): the schema and the columns, or None if there is no usable sidecar
+    """
+    schema = _read_schema(filename)
+    if schema is None:
+        return None
+    directory = sidecar_path(filename)
+    try:
+        columns = {}
+        for i in range(len(schema["headers"])):
+            dtype = np.dtype(schema["dtypes"][i])
+            if schema["rows"] == 0:
+                columns[schema["headers"][i]] = np.empty(0, dtype=dtype) # Empty files cannot be memory-mapped
+            else: # Maps the file without copying it, only the first rows the schema counts belong to the column
+                columns[schema["headers"][i]] = np.memmap(os.path.join(directory, schema["files"][i]), dtype=dtype,
+                                                          mode="r", shape=(schema["rows"],))
+        return schema, columns
+    except (OSError, ValueError, KeyError, TypeError): # Missing, half written or corrupt sidecar, the csv is parsed instead
+        return None
+
+
+def write_sidecar(filename, columns, stat, offset, digest):
+    """
+    Saves parsed columns as one raw binary file per column plus a schema.json describing them.
+    Nothing happens if the sidecar cannot be written, for example in a read-only directory.
+
+    Parameters:
+        filename (string): name of the csv file the columns came from
+        columns (dict): the parsed columns
+        stat (os.stat_result): the stats of the csv file before it was parsed
+        offset (int): number of bytes of the file the columns hold
+        digest (string): hex digest of those bytes, see hash_prefix
+    """
+    directory = sidecar_path(filename)
+    temporary = f"{directory}.tmp-{os.getpid()}" # Written next to the final location then swapped in
+    headers = list(columns)
+    arrays = [np.ascontiguousarray(columns[header]) for header in headers]
+    schema = {
+        "version": SIDECAR_VERSION,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "offset": offset,
+        "digest": digest,
+        "headers": headers,
+        "rows": len(arrays[0]) if headers else 0,
+        "dtypes": [array.dtype.str for array in arrays],
+        "files": [f"{i}.bin" for i in range(len(headers))],
+    }
+    try:
+        os.makedirs(temporary, exist_ok=True)
+        for i in range(len(headers)):
+            arrays[i].tofile(os.path.join(temporary, schema["files"][i]))
+        _write_schema(temporary, schema) # Written last so a complete schema means complete columns
+
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+        os.replace(temporary, directory)
+    except OSError:
+        shutil.rmtree(temporary, ignore_errors=True)
+
+
+def append_sidecar(filename, tail, stat, previous, offset, digest):
+    """
+    Adds rows that were appended to a CSV file to the end of its sidecar, without writing the rows it already holds
+    again. Only a text column that gets a longer string than before is written out again, as a new wider file.
+
+    Parameters:
+        filename (string): name of the csv file
+        tail (dict): the new rows, from read_tail
+        stat (os.stat_result): the stats of the csv file before the rows were read
+        previous (string): the digest the sidecar has to have now, so rows are never added to a sidecar of other contents
+        offset (int), digest (string): how much of the file the sidecar holds afterwards and its digest, see write_sidecar
+
+    Returns:
+        (boolean): whether the sidecar was updated, False if there is no matching sidecar or it could not be written
+    """
+    schema = _read_schema(filename)
+    if schema is None or schema.get("digest") != previous or schema.get("headers") != list(tail):
+        return False
+    directory = sidecar_path(filename)
+    rows = schema["rows"]
+    added = len(next(iter(tail.values()))) if tail else 0
+    dtypes = [np.dtype(dtype) for dtype in schema["dtypes"]]
+    if added and any((dtypes[i].kind == "f") != (tail[header].dtype.kind == "f") for i, header in enumerate(schema["headers"])):
+        return False
+
+    stale = [] # Column files replaced by wider ones, removed once the new schema is in place
+    try:
+        for i in range(len(schema["headers"]) if added else 0):
+            dtype = dtypes[i]
+            new = np.asarray(tail[schema["headers"][i]])
+            path = os.path.join(directory, schema["files"][i])
+            if dtype.kind == "U" and new.dtype.itemsize > dtype.itemsize: # Readers may still map the old file, so it is left alone
+                column = np.concatenate([np.fromfile(path, dtype=dtype, count=rows), new])
+                name = f"{i}.{rows + added}.bin"
+                column.tofile(os.path.join(directory, name))
+                stale.append(path)
+                schema["files"][i], schema["dtypes"][i] = name, column.dtype.str
+            else:
+                with open(path, "r+b") as f:
+                    f.truncate(rows * dtype.itemsize) # Drops anything an earlier append left behind without finishing
+                    f.seek(0, os.SEEK_END)
+                    f.write(np.ascontiguousarray(new, dtype=dtype).tobytes())
+
+        schema.update(mtime_ns=stat.st_mtime_ns, size=stat.st_size, offset=offset, digest=digest, rows=rows + added)
+        _write_schema(directory, schema)
+    except OSError:
+        return False
+    for path in stale:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+    return True
+
+
+def _parse_columns(filename, processes = 1):
+    """
+    Parses a CSV file into typed columns, see read_columns.
+
+    Parameters:
+        filename (string): name of the csv file with .csv at the end
+        processes (int): number of worker processes, see read_columns
+    """
+    if processes != 1 and os.path.getsize(filename) >= PARALLEL_MIN_BYTES:
+        return _parse_columns_parallel(filename, processes)
+
+    with open(filename, "r", encoding=ENCODING) as f:
+        lines = [line for line in f.read().splitlines() if line != ""] # Drops blank lines
+    if not lines:
+        return {}
+
+    headers = lines[0].split(",")
+    cells = _split_cells(lines[1:], len(headers), filename)
+
+    columns = {}
+    for i in range(len(headers)): # Infers the type once per column rather than once per cell
+        columns[headers[i]] = _convert_column(cells[i::len(headers)]) # Every len(headers)-th cell belongs to the same column
+    return columns
+
+
+def _split_cells(lines, num_columns, filename):
+    """
+    Splits lines into one flat list of cells, row after row.
+
+    Parameters:
+        lines (list): the lines to split, without blank lines
+        num_columns (int): the number of columns every line must have
+        filename (string): name of the file, for the error message
+
+    Returns:
+        cells (list): the cells as strings
+    """
+    joined = ",".join(lines)
+    if '"' in joined: # Some cells are quoted, so a comma is not always the end of a cell
+        rows = _split_rows(lines)
+        if any(len(row) != num_columns for row in rows):
+            raise ValueError(f"{filename} has rows with a different number of columns than the header")
+        return [cell for row in rows for cell in row]
+
+    cells = joined.split(",") if lines else [] # Splits every cell in one go instead of row by row
+    if len(cells) != len(lines) * num_columns:
+        raise ValueError(f"{filename} has rows with a different number of columns than the header")
+    return cells
+
+
+def _parse_columns_parallel(filename, processes):
+    """
+    Parses a CSV file into typed columns using several worker processes. The file is split into byte ranges that
+    start and end on line boundaries, each worker parses one range and hands its numeric columns back through
+    shared memory, and the pieces are joined back together in file order.
+
+    Parameters:
+        filename (string): name of the csv file with .csv at the end
+        processes (int): number of worker processes, None for one per core
+    """
+    processes = processes or os.cpu_count() or 1
+
+    # The header and byte order mark are only dealt with once, here
+    with open(filename, "rb") as f:
+        headers = f.readline().decode(ENCODING).rstrip("\r\n").split(",")
+        data_start = f.tell()
+    ranges = _byte_ranges(filename, data_start, os.path.getsize(filename), processes * 2)
+    tasks = [(filename, start, end, len(headers)) for start, end in ranges]
+
+    # Workers share this process's resource tracker, otherwise the shared memory they create is removed when they exit
+    resource_tracker.ensure_running()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = [pool.submit(_parse_range, task) for task in tasks]
+
+    # Every range is collected even after one failed, so the shared memory of all the others can be freed
+    parts = []
+    error = None
+    for future in futures: # In file order
+        try:
+            parts.append(future.result())
+        except Exception as e:
+            error = error or e
+
+    try:
+        if error is not None:
+            raise error
+        columns = {}
+        for i in range(len(headers)):
+            if all(i in part["floats"] for part in parts):
+                columns[headers[i]] = np.concatenate([_shared_column(part, i) for part in parts]) if parts else np.empty(0)
+            elif all(i in part["strings"] for part in parts):
+                columns[headers[i]] = np.concatenate([part["strings"][i] for part in parts])
+            else: # Numeric in some ranges and text in others, the text of the numbers is gone so the file is parsed again in one go
+                return _parse_columns(filename, 1)
+        return columns
+    finally:
+        for part in parts:
+            block = shared_memory.SharedMemory(name=part["block"])
+            block.close()
+            block.unlink()
+
+
+def _byte_ranges(filename, start, end, parts):
+    """
+    Splits the bytes of a file between start and end into about equal ranges that each begin at the start of a line.
+
+    Parameters:
+        filename (string): name of the file
+        start (int): offset of the first byte to split, the start of a line
+        end (int): offset just past the last byte to split
+        parts (int): the number of ranges wanted
+
+    Returns:
+        ranges (list): (start, end) offset pairs in file order
+    """
+    bounds = [start]
+    with open(filename, "rb") as f:
+        for k in range(1, parts):
+            guess = start + (end - start) * k // parts
+            if guess <= bounds[-1]:
+                continue
+            f.seek(guess - 1)
+            f.readline() # Moves to the start of the next line, or stays if guess already is one
+            if bounds[-1] < f.tell() < end:
+                bounds.append(f.tell())
+    bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _parse_range(task):
+    """
+    Worker process: parses one byte range of a CSV file. The numeric columns are written into a new shared memory
+    block so they do not have to be pickled back to the parent, which has to unlink the block when it is done.
+
+    Parameters:
+        task (tuple): the filename, the start and end offsets and the number of columns
+
+    Returns:
+        part (dict): "rows", "block" (name of the shared memory), "floats" (maps a column index to its row in the block)
+        and "strings" (maps a column index to its unicode array)
+    """
+    filename, start, end, num_columns = task
+    with open(filename, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    lines = [line for line in text.splitlines() if line != ""]
+    cells = _split_cells(lines, num_columns, filename)
+    rows = len(cells) // num_columns
+    columns = [_convert_column(cells[i::num_columns]) for i in range(num_columns)]
+
+    float_indexes = [i for i in range(num_columns) if columns[i].dtype == np.float64]
+    block = shared_memory.SharedMemory(create=True, size=max(1, len(float_indexes) * rows * 8))
+    view = np.ndarray((len(float_indexes), rows), dtype=np.float64, buffer=block.buf)
+    for k in range(len(float_indexes)):
+        view[k] = columns[float_indexes[k]]
+    del view # The view has to go before the block can be closed
+    block.close()
+
+    return {
+        "rows": rows,
+        "block": block.name,
+        "floats": {float_indexes[k]: k for k in range(len(float_indexes))},
+        "strings": {i: columns[i] for i in range(num_columns) if i not in float_indexes},
+    }
+
+
+def _shared_column(part, index):
+    """
+    Copies one numeric column of a parsed range out of its shared memory block.
+
+    Parameters:
+        part (dict): from _parse_range
+        index (int): the column
+    """
+    block = shared_memory.SharedMemory(name=part["block"])
+    try:
+        view = np.ndarray((len(part["floats"]), part["rows"]), dtype=np.float64, buffer=block.buf)
+        column = view[part["floats"][index]].copy()
+        del view
+        return column
+    finally:
+        block.close()
+
+
+def _convert_column(column):
+    """
+    Converts a column of strings to float64 if every value in it is numeric, otherwise keeps it as strings.
+    Empty cells in a numeric column become NaN.
+
+    Parameters:
+        column (list): strings from a single column
+
+    Returns:
+        NumPy array: the float64 column or a unicode array as wide as the longest string
+    """
+    try:
+        return np.array(column, dtype=np.float64) # NumPy parses the whole column at once
+    except ValueError: # At least one value is not a number
+        pass
 
+    if "" in column: # Maybe the column is numeric but has missing values
+        try:
+            return np.array([value if value != "" else "nan" for value in column], dtype=np.float64)
+        except ValueError:
+            pass
+    return np.array(column, dtype=str)